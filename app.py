@@ -1,24 +1,24 @@
 # app.py
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, send_file
 import os
+import base64
+import json
 import uuid
-import re
 import hashlib
 import logging
 import shutil
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from chonkie import NeuralChunker
-from duckduckgo_search import DDGS
 
 
-# Document processing imports
-import PyPDF2
-import docx
-from pptx import Presentation
-
 # ChromaDB import
 import chromadb
+from chromadb.utils import embedding_functions
 
 # Conversation storage import
 from conversation.sqlite import SQLiteConversationStorage
@@ -28,6 +28,33 @@ from llms.openai_llm import OpenAILLM
 from llms.claude_llm import ClaudeLLM
 from llms.gemini_llm import GeminiLLM
 from llms.ollama_llm import OllamaLLM
+from llms.base import LLM, LLMError
+from llms.mock_llm import MockLLM
+from llms.registry import LLMRegistry
+from llms.limits import MESSAGE_OVERHEAD_TOKENS, context_window
+from jobs import IngestionError, IngestionJobQueue
+from embeddings import EmbeddingCache
+from extraction import iter_document_segments
+from websearch import CachedWebSearch, DuckDuckGoSearch
+from metrics import MetricsRegistry
+from retrieval import (
+    CrossEncoderReranker,
+    TTLCache,
+    estimate_tokens,
+    is_keyword_query,
+    merge_hits,
+    normalize_query,
+    pack_context,
+    reciprocal_rank_fusion,
+    window_history,
+)
+
+if __name__ == "__main__":
+    # Started as `python app.py`: restart as serve.py before initializing anything.
+    # Spawned worker processes (PDF extraction) re-run the main script, and this one
+    # loads models, opens the stores and starts background jobs at import time.
+    serve_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py")
+    os.execv(sys.executable, [sys.executable, serve_script] + sys.argv[1:])
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,26 +62,83 @@ logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
-app.config["UPLOAD_FOLDER"] = "uploads"
+app.config["UPLOAD_FOLDER"] = os.environ.get("UPLOAD_FOLDER", "uploads")
 app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50MB
+app.config["INGEST_WORKERS"] = int(os.environ.get("INGEST_WORKERS", 2))
+app.config["PDF_EXTRACT_WORKERS"] = int(os.environ.get("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+app.config["PDF_PARALLEL_MIN_PAGES"] = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 50))
+app.config["CHUNK_WINDOW_CHARS"] = int(os.environ.get("CHUNK_WINDOW_CHARS", 20_000))
+app.config["INDEX_BATCH_SIZE"] = int(os.environ.get("INDEX_BATCH_SIZE", 64))
+app.config["VECTOR_BATCH_SIZE"] = int(os.environ.get("VECTOR_BATCH_SIZE", 500))  # ids per ChromaDB delete/update
+app.config["EMBEDDING_CACHE_MAX_ENTRIES"] = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", 100_000))
+app.config["RETRIEVAL_MODE"] = os.environ.get("RETRIEVAL_MODE", "auto")  # vector, lexical, hybrid or auto
+app.config["HYBRID_CANDIDATES"] = int(os.environ.get("HYBRID_CANDIDATES", 20))
+app.config["RERANK_ENABLED"] = os.environ.get("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+app.config["RERANK_MODEL"] = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+app.config["RERANK_CANDIDATES"] = int(os.environ.get("RERANK_CANDIDATES", 30))
+app.config["RERANK_BATCH_SIZE"] = int(os.environ.get("RERANK_BATCH_SIZE", 16))
+app.config["RERANK_BUDGET_MS"] = float(os.environ.get("RERANK_BUDGET_MS", 250))
+app.config["CHAT_STAGE_WORKERS"] = int(os.environ.get("CHAT_STAGE_WORKERS", 16))
+app.config["RETRIEVAL_TIMEOUT"] = float(os.environ.get("RETRIEVAL_TIMEOUT", 10))
+app.config["WEB_SEARCH_TIMEOUT"] = float(os.environ.get("WEB_SEARCH_TIMEOUT", 4))
+app.config["LLM_SETUP_TIMEOUT"] = float(os.environ.get("LLM_SETUP_TIMEOUT", 10))
+app.config["WEB_SEARCH_CACHE_TTL"] = float(os.environ.get("WEB_SEARCH_CACHE_TTL", 600))
+app.config["WEB_SEARCH_MAX_CONCURRENT"] = int(os.environ.get("WEB_SEARCH_MAX_CONCURRENT", 2))
+app.config["WEB_SEARCH_MAX_RETRIES"] = int(os.environ.get("WEB_SEARCH_MAX_RETRIES", 2))
+app.config["CHAT_CONTEXT_CHUNKS"] = int(os.environ.get("CHAT_CONTEXT_CHUNKS", 3))
+app.config["PROMPT_TOKEN_BUDGET"] = int(os.environ.get("PROMPT_TOKEN_BUDGET", 6000))  # capped by the model's window
+app.config["RESPONSE_TOKEN_RESERVE"] = int(os.environ.get("RESPONSE_TOKEN_RESERVE", 1024))
+app.config["HISTORY_MAX_MESSAGES"] = int(os.environ.get("HISTORY_MAX_MESSAGES", 6))
+app.config["HISTORY_TOKEN_SHARE"] = float(os.environ.get("HISTORY_TOKEN_SHARE", 0.25))
+app.config["CONVERSATIONS_PAGE_SIZE"] = int(os.environ.get("CONVERSATIONS_PAGE_SIZE", 50))
+app.config["MAX_PAGE_SIZE"] = int(os.environ.get("MAX_PAGE_SIZE", 500))
+app.config["RETRIEVAL_CACHE_MAX_ENTRIES"] = int(os.environ.get("RETRIEVAL_CACHE_MAX_ENTRIES", 1024))
+app.config["RETRIEVAL_CACHE_TTL"] = float(os.environ.get("RETRIEVAL_CACHE_TTL", 300))
+# The offline "mock" LLM provider, for load testing without vendor latency
+app.config["MOCK_LLM_TTFT_MS"] = float(os.environ.get("MOCK_LLM_TTFT_MS", 200))
+app.config["MOCK_LLM_TOKENS_PER_SEC"] = float(os.environ.get("MOCK_LLM_TOKENS_PER_SEC", 50))  # 0: no delay
+app.config["MOCK_LLM_RESPONSE_TOKENS"] = int(os.environ.get("MOCK_LLM_RESPONSE_TOKENS", 64))
+app.config["MOCK_LLM_CHUNK_TOKENS"] = int(os.environ.get("MOCK_LLM_CHUNK_TOKENS", 1))
+app.config["MOCK_LLM_ERROR_RATE"] = float(os.environ.get("MOCK_LLM_ERROR_RATE", 0))
+app.config["MOCK_LLM_SEED"] = int(os.environ.get("MOCK_LLM_SEED", 0))
 
 # Initialize ChromaDB
+CHROMA_DATA_DIR = os.environ.get("CHROMA_DATA_DIR", "/app/chroma_data")
+
+# Chunks are embedded by us (through the embedding cache) with the same model
+# Chroma uses by default, so stored and query embeddings stay comparable
+embedding_function = embedding_functions.DefaultEmbeddingFunction()
+
 try:
-    chroma_client = chromadb.PersistentClient(path="/app/chroma_data")
+    chroma_client = chromadb.PersistentClient(path=CHROMA_DATA_DIR)
     collection = chroma_client.get_or_create_collection(
-        name="knowledge_base", metadata={"hnsw:space": "cosine"}
+        name="knowledge_base", metadata={"hnsw:space": "cosine"},
+        embedding_function=embedding_function,
     )
     logger.info("ChromaDB initialized successfully")
 except Exception as e:
     logger.error(f"ChromaDB initialization failed: {e}")
     collection = None
 
+# Chunk embeddings are cached on disk by content hash, so identical chunk text
+# (boilerplate pages, re-uploads, re-index runs) is only ever embedded once
+try:
+    embedding_cache = EmbeddingCache(
+        os.path.join(CHROMA_DATA_DIR, "embedding_cache"),
+        max_entries=app.config["EMBEDDING_CACHE_MAX_ENTRIES"],
+        model=embedding_functions.ONNXMiniLM_L6_V2.MODEL_NAME,
+    )
+except Exception as e:
+    logger.error(f"Embedding cache initialization failed: {e}")
+    embedding_cache = None
+
 # Constants
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ALLOWED_EXTENSIONS = {"txt", "pdf", "docx", "pptx", "md", "csv", "json"}
 
 # Initialize storage systems
-SQLITE_DB_DIR = "/app/sqlite_dbs"
+SQLITE_DB_DIR = os.environ.get("SQLITE_DB_DIR", "/app/sqlite_dbs")
+os.makedirs(SQLITE_DB_DIR, exist_ok=True)
 
 conversation_db: SQLiteConversationStorage = SQLiteConversationStorage(db_path=os.path.join(SQLITE_DB_DIR, "conversations.db"))
 conversation_db.init()
@@ -70,48 +154,280 @@ llm_settings_db = LLMSettingsStorage(db_path=LLM_SETTINGS_DB_PATH)
 llm_settings_db.init()
 
 
+# Repeated questions skip both the query embedding and the vector search. Result
+# keys include the knowledge-base version, so uploads and deletes invalidate them
+query_embedding_cache = TTLCache(
+    max_entries=app.config["RETRIEVAL_CACHE_MAX_ENTRIES"], ttl=app.config["RETRIEVAL_CACHE_TTL"]
+)
+retrieval_cache = TTLCache(
+    max_entries=app.config["RETRIEVAL_CACHE_MAX_ENTRIES"], ttl=app.config["RETRIEVAL_CACHE_TTL"]
+)
+reranker = CrossEncoderReranker(
+    model_name=app.config["RERANK_MODEL"], batch_size=app.config["RERANK_BATCH_SIZE"]
+)
+
+
+def query_collection(query, n_results, where_clause=None):
+    """Query ChromaDB through the retrieval cache"""
+    normalized_query = normalize_query(query)
+    cache_key = (
+        normalized_query,
+        json.dumps(where_clause or {}, sort_keys=True),
+        n_results,
+        document_db.get_kb_version(),
+    )
+    results = retrieval_cache.get(cache_key)
+    if results is not None:
+        return results
+
+    query_embedding = query_embedding_cache.get(normalized_query)
+    if query_embedding is None:
+        query_embedding = [float(v) for v in embedding_function([query])[0]]
+        query_embedding_cache.put(normalized_query, query_embedding)
+
+    with vector_query_seconds.time():
+        if where_clause:
+            results = collection.query(
+                query_embeddings=[query_embedding], n_results=n_results, where=where_clause
+            )
+        else:
+            results = collection.query(query_embeddings=[query_embedding], n_results=n_results)
+
+    retrieval_cache.put(cache_key, results)
+    return results
+
+
+def vector_search(query, n_results, where_clause):
+    """Dense search through ChromaDB, as a list of hit dicts"""
+    results = query_collection(query, n_results, where_clause)
+    hits = []
+    if results["documents"] and results["documents"][0]:
+        for chunk_id, doc, metadata, distance in zip(
+            results["ids"][0],
+            results["documents"][0],
+            results["metadatas"][0],
+            results["distances"][0],
+        ):
+            hits.append(
+                {
+                    "chunk_id": chunk_id,
+                    "content": doc,
+                    "file_id": metadata.get("file_id"),
+                    "filename": metadata["filename"],
+                    "chunk_index": metadata["chunk_index"],
+                    "folder_id": metadata["folder_id"],
+                    "upload_date": metadata["upload_date"],
+                    "similarity": 1 - distance,
+                    "match": "vector",
+                }
+            )
+    return hits
+
+
+def lexical_search(query, n_results, selected_document_ids, folder_id):
+    """BM25 search over the SQLite FTS5 chunk index, as a list of hit dicts"""
+    rows = document_db.search_chunks(
+        query,
+        n_results,
+        file_ids=selected_document_ids or None,
+        folder_id=folder_id if folder_id and folder_id != "root" else None,
+    )
+    # bm25() is negative with the best match lowest; scale relative to the best hit
+    best_score = rows[0]["score"] if rows else 0
+    hits = []
+    for row in rows:
+        hits.append(
+            {
+                "chunk_id": row["chunk_id"],
+                "content": row["content"],
+                "file_id": row["file_id"],
+                "filename": row["filename"],
+                "chunk_index": row["chunk_index"],
+                "folder_id": row["folder_id"],
+                "upload_date": row["upload_date"],
+                "similarity": row["score"] / best_score if best_score else 0.0,
+                "match": "lexical",
+            }
+        )
+    return hits
+
+
+def retrieve_candidates(query, n_results, selected_document_ids=None, folder_id=None, mode=None):
+    """Retrieve the best chunks for a query, without reranking.
+
+    `mode` is "vector" (dense only), "lexical" (BM25 only, no embedding), "hybrid"
+    (both, fused with reciprocal rank fusion) or "auto", which takes the lexical
+    fast path for short keyword queries and falls back to hybrid when it finds
+    nothing. Returns the hits and the mode actually used.
+    """
+    mode = mode or app.config["RETRIEVAL_MODE"]
+
+    # Build where clause
+    where_clause = {}
+    if selected_document_ids:
+        # If specific documents are selected, filter by them
+        where_clause["file_id"] = {"$in": selected_document_ids}
+    elif folder_id and folder_id != "root":
+        # If a folder is selected but no specific documents, filter by the folder's subtree
+        where_clause[ancestor_key(folder_id)] = True
+
+    if mode == "auto":
+        if is_keyword_query(query):
+            hits = lexical_search(query, n_results, selected_document_ids, folder_id)
+            if hits:
+                return hits, "lexical"
+        mode = "hybrid"
+
+    if mode == "lexical":
+        return lexical_search(query, n_results, selected_document_ids, folder_id), mode
+    if mode != "hybrid":
+        return vector_search(query, n_results, where_clause), "vector"
+
+    candidates = max(n_results, app.config["HYBRID_CANDIDATES"])
+    vector_hits = vector_search(query, candidates, where_clause)
+    lexical_hits = lexical_search(query, candidates, selected_document_ids, folder_id)
+    hits_by_id = {hit["chunk_id"]: hit for hit in lexical_hits}
+    for hit in vector_hits:
+        if hit["chunk_id"] in hits_by_id:
+            hit = dict(hit, match="hybrid")
+        hits_by_id[hit["chunk_id"]] = hit
+
+    fused_ids = reciprocal_rank_fusion(
+        [[hit["chunk_id"] for hit in vector_hits], [hit["chunk_id"] for hit in lexical_hits]]
+    )
+    return [hits_by_id[chunk_id] for chunk_id in fused_ids[:n_results]], mode
+
+
+def retrieve_chunks(query, n_results, selected_document_ids=None, folder_id=None, mode=None, rerank=None):
+    """Retrieve the best chunks for a query, optionally reranked with a cross-encoder.
+
+    With reranking, RERANK_CANDIDATES chunks are over-fetched and rescored within
+    RERANK_BUDGET_MS; if the budget runs out the retrieval order is kept. Returns
+    the hits and a dict describing the retrieval mode and rerank timing.
+    """
+    rerank = app.config["RERANK_ENABLED"] if rerank is None else rerank
+    if not rerank:
+        hits, mode = retrieve_candidates(query, n_results, selected_document_ids, folder_id, mode)
+        return hits, {"mode": mode, "rerank": None}
+
+    candidates = max(n_results, app.config["RERANK_CANDIDATES"])
+    hits, mode = retrieve_candidates(query, candidates, selected_document_ids, folder_id, mode)
+    order, report = reranker.rerank(query, [hit["content"] for hit in hits], app.config["RERANK_BUDGET_MS"])
+    if order is not None:
+        hits = [hits[i] for i in order]
+    logger.info(f"Rerank: {report}")
+    return hits[:n_results], {"mode": mode, "rerank": report}
+
+
+# LLM clients are cached per provider and rebuilt only when their settings change
+llm_registry = LLMRegistry()
+
+
+DEFAULT_LLM_MODELS = {
+    "openai": "gpt-3.5-turbo",
+    "claude": "claude-3-sonnet-20240229",
+    "gemini": "gemini-pro",
+    "ollama": "llama2",
+    "mock": "mock",
+}
+
+
+def get_llm_model(llm_provider: str):
+    """The configured model name for a provider"""
+    return llm_settings_db.get_setting(f"{llm_provider}_model") or DEFAULT_LLM_MODELS.get(llm_provider)
+
+
 def get_llm_instance(llm_provider: str):
     settings = llm_settings_db.get_all_settings()
     if llm_provider == "openai":
         api_key = settings.get("openai_api_key")
-        model = settings.get("openai_model", "gpt-3.5-turbo")
+        model = settings.get("openai_model", DEFAULT_LLM_MODELS["openai"])
         if not api_key: raise ValueError("OpenAI API Key not configured.")
-        return OpenAILLM(api_key=api_key, model=model)
+        return llm_registry.get("openai", (api_key, model), lambda: OpenAILLM(api_key=api_key, model=model))
     elif llm_provider == "claude":
         api_key = settings.get("claude_api_key")
-        model = settings.get("claude_model", "claude-3-sonnet-20240229")
+        model = settings.get("claude_model", DEFAULT_LLM_MODELS["claude"])
         if not api_key: raise ValueError("Claude API Key not configured.")
-        return ClaudeLLM(api_key=api_key, model=model)
+        return llm_registry.get("claude", (api_key, model), lambda: ClaudeLLM(api_key=api_key, model=model))
     elif llm_provider == "gemini":
         api_key = settings.get("gemini_api_key")
-        model = settings.get("gemini_model", "gemini-pro")
+        model = settings.get("gemini_model", DEFAULT_LLM_MODELS["gemini"])
         if not api_key: raise ValueError("Gemini API Key not configured.")
-        return GeminiLLM(api_key=api_key, model=model)
+        return llm_registry.get("gemini", (api_key, model), lambda: GeminiLLM(api_key=api_key, model=model))
     elif llm_provider == "ollama":
         endpoint = settings.get("ollama_endpoint", "http://localhost:11434")
-        model = settings.get("ollama_model", "llama2")
-        return OllamaLLM(endpoint=endpoint, model=model)
+        model = settings.get("ollama_model", DEFAULT_LLM_MODELS["ollama"])
+        return llm_registry.get("ollama", (endpoint, model), lambda: OllamaLLM(endpoint=endpoint, model=model))
+    elif llm_provider == "mock":
+        config = {
+            "ttft_ms": app.config["MOCK_LLM_TTFT_MS"],
+            "tokens_per_sec": app.config["MOCK_LLM_TOKENS_PER_SEC"],
+            "response_tokens": app.config["MOCK_LLM_RESPONSE_TOKENS"],
+            "chunk_tokens": app.config["MOCK_LLM_CHUNK_TOKENS"],
+            "error_rate": app.config["MOCK_LLM_ERROR_RATE"],
+            "seed": app.config["MOCK_LLM_SEED"],
+        }
+        return llm_registry.get("mock", tuple(sorted(config.items())), lambda: MockLLM(**config))
     else:
         raise ValueError(f"Unknown LLM provider: {llm_provider}")
 
+# Identical questions asked again within WEB_SEARCH_CACHE_TTL reuse the results,
+# and a global cap keeps bursts of chats from getting us rate limited. Swap
+# `web_search.backend` for any WebSearchBackend to search somewhere else
+web_search = CachedWebSearch(
+    DuckDuckGoSearch(),
+    TTLCache(max_entries=app.config["RETRIEVAL_CACHE_MAX_ENTRIES"], ttl=app.config["WEB_SEARCH_CACHE_TTL"]),
+    normalize_query,
+    max_concurrent=app.config["WEB_SEARCH_MAX_CONCURRENT"],
+    max_retries=app.config["WEB_SEARCH_MAX_RETRIES"],
+    timeout=app.config["WEB_SEARCH_TIMEOUT"],
+)
+
+
+# Prometheus metrics, served from /metrics
+metrics = MetricsRegistry()
+ingest_stage_seconds = metrics.histogram(
+    "ragfuse_ingest_stage_seconds",
+    "Ingestion time per stage: extraction and chunking per file, embedding and vector_add per batch",
+    ["stage", "file_type"],
+)
+ingested_files = metrics.counter(
+    "ragfuse_ingested_files_total", "Uploaded files by ingestion result", ["file_type", "result"]
+)
+ingested_bytes = metrics.counter("ragfuse_ingested_bytes_total", "Bytes of uploaded files indexed", ["file_type"])
+ingested_chunks = metrics.counter("ragfuse_ingested_chunks_total", "Chunks produced by ingestion", ["file_type"])
+vector_query_seconds = metrics.histogram("ragfuse_vector_query_seconds", "ChromaDB query time")
+web_search_seconds = metrics.histogram("ragfuse_web_search_seconds", "Web search time, including cache hits")
+llm_generation_seconds = metrics.histogram(
+    "ragfuse_llm_generation_seconds", "LLM response time, to the last token when streaming", ["provider", "streaming"]
+)
+errors = metrics.counter("ragfuse_errors_total", "Failures and timeouts by stage", ["stage"])
+
+
+def cache_counts(attribute):
+    caches = {
+        "retrieval": retrieval_cache,
+        "query_embedding": query_embedding_cache,
+        "embedding": embedding_cache,
+        "web_search": web_search.cache,
+    }
+    return {(name,): getattr(cache, attribute) for name, cache in caches.items() if cache is not None}
+
+
+metrics.callback("ragfuse_cache_hits_total", "Cache hits", "counter", lambda: cache_counts("hits"), ["cache"])
+metrics.callback("ragfuse_cache_misses_total", "Cache misses", "counter", lambda: cache_counts("misses"), ["cache"])
+
+
 def duckduckgo_web_search(query: str) -> dict:
     """Performs a web search using DuckDuckGo Search.
     """
     try:
-        # Perform DuckDuckGo search
         # You can adjust the number of results (max_results) as needed
-        search_results = DDGS().text(keywords=query, max_results=5)
-
-        formatted_results = []
-        for result in search_results:
-            formatted_results.append({
-                "title": result.get("title"),
-                "link": result.get("href"),
-                "snippet": result.get("body")
-            })
-        return {"search_results": formatted_results}
+        with web_search_seconds.time():
+            return {"search_results": web_search.search(query, max_results=5)}
 
     except Exception as e:
+        errors.inc(stage="web_search")
         logger.error(f"DuckDuckGo web search failed: {e}")
         raise RuntimeError(f"Error performing DuckDuckGo web search: {e}")
 
@@ -135,103 +451,20 @@ def get_file_hash(file_path):
 
 
 # Document Processing Functions
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF file"""
-    text = ""
-    try:
-        with open(file_path, "rb") as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                except Exception as e:
-                    logger.warning(f"Error extracting text from PDF page: {e}")
-                    continue
-        logger.info(f"Extracted {len(text)} characters from PDF: {file_path}")
-        return text.strip()
-    except Exception as e:
-        logger.error(f"PDF extraction error for {file_path}: {e}")
-        return ""
-
-
-def extract_text_from_docx(file_path):
-    """Extract text from DOCX file"""
-    text = ""
-    try:
-        doc = docx.Document(file_path)
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text += paragraph.text + "\n"
-
-        # Extract from tables
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    if cell.text.strip():
-                        text += cell.text + " "
-                text += "\n"
-
-        return text.strip()
-    except Exception as e:
-        logger.error(f"DOCX extraction error: {e}")
-        return ""
-
-
-def extract_text_from_pptx(file_path):
-    """Extract text from PPTX file"""
-    text = ""
-    try:
-        prs = Presentation(file_path)
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text.strip():
-                    text += shape.text + "\n"
-        return text.strip()
-    except Exception as e:
-        logger.error(f"PPTX extraction error: {e}")
-        return ""
-
-
-def extract_text_from_txt(file_path):
-    """Extract text from text files"""
-    encodings = ["utf-8", "latin-1", "cp1252", "iso-8859-1"]
-    for encoding in encodings:
-        try:
-            with open(file_path, "r", encoding=encoding) as file:
-                return file.read().strip()
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            logger.error(f"Text extraction error: {e}")
-            continue
-    return ""
+def document_segments(file_path, filename):
+    """Stream a document's normalized text segments using the configured extraction settings"""
+    return iter_document_segments(
+        file_path,
+        filename,
+        pdf_workers=app.config["PDF_EXTRACT_WORKERS"],
+        pdf_parallel_min_pages=app.config["PDF_PARALLEL_MIN_PAGES"],
+    )
 
 
 def process_document(file_path, filename):
-    """Process document and extract text"""
+    """Process document and extract its whitespace-normalized text"""
     try:
-        file_extension = filename.rsplit(".", 1)[1].lower()
-
-        # Extract text based on file type
-        if file_extension == "pdf":
-            text = extract_text_from_pdf(file_path)
-        elif file_extension == "docx":
-            text = extract_text_from_docx(file_path)
-        elif file_extension == "pptx":
-            text = extract_text_from_pptx(file_path)
-        elif file_extension in ["txt", "md", "csv", "json"]:
-            text = extract_text_from_txt(file_path)
-        else:
-            return ""
-
-        # Clean text
-        if text:
-            text = re.sub(r"\s+", " ", text)
-            text = text.strip()
-
-        return text
+        return " ".join(document_segments(file_path, filename))
     except Exception as e:
         logger.error(f"Document processing error: {e}")
         return ""
@@ -308,6 +541,409 @@ def chunk_text(text, chunk_size=10):
     return [chunk.text for chunk in chunks]
 
 
+def iter_chunks(segments, window_chars=None):
+    """
+    Chunk a stream of text segments while holding at most about one window of text.
+
+    Segments are buffered until `window_chars` characters, the window is chunked and
+    all but its last chunk are emitted. The last chunk may have been cut off by the
+    window boundary, so it is carried into the next window and chunked again.
+    """
+    window_chars = window_chars or app.config["CHUNK_WINDOW_CHARS"]
+    buffer = []
+    buffered_chars = 0
+
+    for segment in segments:
+        buffer.append(segment)
+        buffered_chars += len(segment) + 1
+        if buffered_chars < window_chars:
+            continue
+
+        chunks = chunk_text(" ".join(buffer))
+        buffer = []
+        buffered_chars = 0
+        if len(chunks) < 2:
+            # No boundary inside the window; carrying it over would grow without bound
+            yield from chunks
+            continue
+        yield from chunks[:-1]
+        buffer = [chunks[-1]]
+        buffered_chars = len(chunks[-1]) + 1
+
+    if buffer:
+        yield from chunk_text(" ".join(buffer))
+
+
+def embed_chunks(texts):
+    """Embed chunk texts, serving repeated texts from the embedding cache"""
+    if not embedding_cache:
+        return [list(map(float, v)) for v in embedding_function(texts)]
+
+    embeddings = embedding_cache.get_many(texts)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        computed = [list(map(float, v)) for v in embedding_function(missing_texts)]
+        embedding_cache.put_many(missing_texts, computed)
+        for i, embedding in zip(missing, computed):
+            embeddings[i] = embedding
+    return embeddings
+
+
+def ancestor_key(folder_id):
+    """Chunk metadata key set to True on chunks stored in `folder_id` or any folder below it"""
+    return f"ancestor_{folder_id}"
+
+
+def folder_ancestor_metadata(folder_id):
+    """Ancestor keys for a chunk stored in `folder_id`, so a folder-subtree filter is a single predicate"""
+    path = document_db.get_folder_path(folder_id) or ["root", folder_id]
+    return {ancestor_key(ancestor_id): True for ancestor_id in path}
+
+
+def reuse_duplicate_file(existing_file, filename, folder_id, file_size):
+    """Register an upload whose content hash matches an already indexed file.
+
+    The same file re-uploaded under the same name into the same folder is left as is.
+    Otherwise the existing chunk set is copied under a new file id, reusing its stored
+    embeddings. Returns None if the existing chunks cannot be found in ChromaDB.
+    """
+    if existing_file["folder_id"] == folder_id and existing_file["name"] == filename:
+        return {
+            "file_id": existing_file["id"],
+            "chunk_count": existing_file["chunk_count"],
+            "deduplicated": True,
+            "duplicate_of": existing_file["id"],
+        }
+
+    existing_chunks = collection.get(
+        where={"file_id": existing_file["id"]},
+        include=["embeddings", "documents", "metadatas"],
+    )
+    if not existing_chunks["ids"]:
+        return None
+
+    file_id = str(uuid.uuid4())
+    file_extension = filename.rsplit(".", 1)[1].lower()
+    upload_date = datetime.now().isoformat()
+    ancestors = folder_ancestor_metadata(folder_id)
+    chunk_ids = []
+    chunk_metadatas = []
+    for metadata in existing_chunks["metadatas"]:
+        chunk_index = metadata["chunk_index"]
+        chunk_ids.append(f"{file_id}_chunk_{chunk_index}")
+        chunk_metadatas.append(
+            {
+                "file_id": file_id,
+                "filename": filename,
+                "chunk_index": chunk_index,
+                "folder_id": folder_id,
+                "file_extension": file_extension,
+                "upload_date": upload_date,
+                **ancestors,
+            }
+        )
+
+    try:
+        collection.add(
+            ids=chunk_ids,
+            embeddings=existing_chunks["embeddings"],
+            documents=existing_chunks["documents"],
+            metadatas=chunk_metadatas,
+        )
+
+        document_db.copy_chunks(existing_file["id"], file_id)
+        existing_text = document_db.get_file_text(existing_file["id"])
+        if existing_text is not None:
+            document_db.save_file_text(file_id, existing_text)
+        document_db.add_file(
+            {
+                "id": file_id,
+                "name": filename,
+                "extension": file_extension,
+                "size": file_size,
+                "hash": existing_file["hash"],
+                "folder_id": folder_id,
+                "chunk_count": len(chunk_ids),
+                "created_at": upload_date,
+                "text_length": existing_file["text_length"],
+            }
+        )
+    except Exception:
+        # Don't leave the copied chunks behind without a file row; they would show up in search
+        collection.delete(where={"file_id": file_id})
+        document_db.delete_chunks(file_id)
+        raise
+
+    return {
+        "file_id": file_id,
+        "chunk_count": len(chunk_ids),
+        "deduplicated": True,
+        "duplicate_of": existing_file["id"],
+    }
+
+
+def ingest_file(file_save_path, filename, folder_id, report):
+    """Run a saved upload through extract -> chunk -> embed -> index.
+
+    Called from the ingestion worker pool. Raises IngestionError (after removing
+    the saved file) when the file yields nothing to index.
+    """
+    file_extension = filename.rsplit(".", 1)[1].lower()
+    try:
+        report(stage="hashing")
+        file_size = os.path.getsize(file_save_path)
+        file_hash = get_file_hash(file_save_path)
+        if not file_hash:
+            raise IngestionError("Could not hash file")
+
+        # Skip extraction, chunking and embedding for content we already indexed
+        existing_file = document_db.get_file_by_hash(file_hash, folder_id)
+        if existing_file:
+            report(stage="deduplicating")
+            result = reuse_duplicate_file(existing_file, filename, folder_id, file_size)
+            if result:
+                ingested_files.inc(file_type=file_extension, result="deduplicated")
+                return result
+
+        # Stream the document through extraction -> chunking -> embedding, adding
+        # chunks to ChromaDB in batches so memory stays bounded by the chunk window
+        report(stage="extracting")
+        file_id = str(uuid.uuid4())
+        upload_date = datetime.now().isoformat()
+        text_length = 0
+        chunk_count = 0
+        # Extraction, chunking and indexing interleave; time each separately
+        extract_seconds = 0.0
+        index_seconds = 0.0
+        # The extracted text is kept (compressed) for previews as it streams past
+        text_compressor = zlib.compressobj()
+        compressed_parts = []
+
+        def counted_segments():
+            nonlocal text_length, extract_seconds
+            segments = document_segments(file_save_path, filename)
+            while True:
+                began = time.perf_counter()
+                segment = next(segments, None)
+                extract_seconds += time.perf_counter() - began
+                if segment is None:
+                    break
+                # Segments are joined with a single space
+                if text_length:
+                    segment_text = " " + segment
+                else:
+                    segment_text = segment
+                text_length += len(segment_text)
+                compressed_parts.append(text_compressor.compress(segment_text.encode("utf-8")))
+                yield segment
+
+        ancestors = folder_ancestor_metadata(folder_id)
+
+        def index_batch(batch):
+            nonlocal chunk_count, index_seconds
+            began = time.perf_counter()
+            report(stage="embedding", chunk_count=chunk_count)
+            chunk_ids = []
+            chunk_metadatas = []
+            for i in range(chunk_count, chunk_count + len(batch)):
+                chunk_ids.append(f"{file_id}_chunk_{i}")
+                chunk_metadatas.append(
+                    {
+                        "file_id": file_id,
+                        "filename": filename,
+                        "chunk_index": i,
+                        "folder_id": folder_id,
+                        "file_extension": file_extension,
+                        "upload_date": upload_date,
+                        **ancestors,
+                    }
+                )
+            with ingest_stage_seconds.time(stage="embedding", file_type=file_extension):
+                embeddings = embed_chunks(batch)
+            with ingest_stage_seconds.time(stage="vector_add", file_type=file_extension):
+                collection.add(
+                    ids=chunk_ids,
+                    embeddings=embeddings,
+                    documents=batch,
+                    metadatas=chunk_metadatas,
+                )
+            document_db.add_chunks(
+                file_id,
+                [(chunk_id, chunk_count + i, chunk) for i, (chunk_id, chunk) in enumerate(zip(chunk_ids, batch))],
+            )
+            chunk_count += len(batch)
+            report(stage="chunking", chunk_count=chunk_count)
+            index_seconds += time.perf_counter() - began
+
+        pipeline_began = time.perf_counter()
+        try:
+            batch = []
+            for chunk in iter_chunks(counted_segments()):
+                batch.append(chunk)
+                if len(batch) >= app.config["INDEX_BATCH_SIZE"]:
+                    index_batch(batch)
+                    batch = []
+            if batch:
+                index_batch(batch)
+            ingest_stage_seconds.observe(extract_seconds, stage="extraction", file_type=file_extension)
+            ingest_stage_seconds.observe(
+                time.perf_counter() - pipeline_began - extract_seconds - index_seconds,
+                stage="chunking", file_type=file_extension,
+            )
+        except Exception:
+            # Don't leave a partial chunk set behind
+            if chunk_count:
+                collection.delete(where={"file_id": file_id})
+                document_db.delete_chunks(file_id)
+            raise
+
+        if not text_length:
+            raise IngestionError("No text could be extracted")
+        if not chunk_count:
+            raise IngestionError("No chunks were produced")
+
+        # Add to SQLite document storage
+        report(stage="indexing", chunk_count=chunk_count)
+        file_info = {
+            "id": file_id,
+            "name": filename,
+            "extension": file_extension,
+            "size": file_size,
+            "hash": file_hash,
+            "folder_id": folder_id,
+            "chunk_count": chunk_count,
+            "created_at": upload_date,
+            "text_length": text_length,
+        }
+        compressed_parts.append(text_compressor.flush())
+        document_db.save_file_text(file_id, b"".join(compressed_parts))
+        document_db.add_file(file_info)
+
+        ingested_files.inc(file_type=file_extension, result="indexed")
+        ingested_bytes.inc(file_size, file_type=file_extension)
+        ingested_chunks.inc(chunk_count, file_type=file_extension)
+        return {"file_id": file_id, "chunk_count": chunk_count}
+
+    except Exception:
+        ingested_files.inc(file_type=file_extension, result="failed")
+        errors.inc(stage="ingestion")
+        # Clean up the saved file if anything went wrong
+        if os.path.exists(file_save_path):
+            os.remove(file_save_path)
+        raise
+
+
+def backfill_lexical_index():
+    """Add chunks of files indexed before the FTS5 chunk index existed"""
+    try:
+        for file_id in document_db.get_files_without_chunks():
+            existing_chunks = collection.get(where={"file_id": file_id}, include=["documents", "metadatas"])
+            rows = [
+                (chunk_id, metadata["chunk_index"], doc)
+                for chunk_id, doc, metadata in zip(
+                    existing_chunks["ids"], existing_chunks["documents"], existing_chunks["metadatas"]
+                )
+            ]
+            if rows:
+                document_db.add_chunks(file_id, rows)
+    except Exception as e:
+        logger.error(f"Lexical index backfill failed: {e}")
+
+
+def backfill_folder_ancestors():
+    """Add ancestor keys to chunks indexed before they existed. Only metadata is updated."""
+    try:
+        updated = 0
+        paths = {}
+        while True:
+            batch = collection.get(
+                where={ancestor_key("root"): {"$ne": True}},
+                include=["metadatas"],
+                limit=app.config["VECTOR_BATCH_SIZE"],
+            )
+            if not batch["ids"]:
+                break
+            metadatas = []
+            for metadata in batch["metadatas"]:
+                folder_id = metadata.get("folder_id", "root")
+                if folder_id not in paths:
+                    paths[folder_id] = folder_ancestor_metadata(folder_id)
+                metadatas.append(paths[folder_id])
+            collection.update(ids=batch["ids"], metadatas=metadatas)
+            updated += len(batch["ids"])
+        if updated:
+            # Folder-filtered results cached before the backfill missed these chunks
+            document_db.bump_kb_version()
+            logger.info(f"Added folder ancestors to {updated} chunks")
+    except Exception as e:
+        logger.error(f"Folder ancestor backfill failed: {e}")
+
+
+def move_folder_vectors(folder_id, marker):
+    """Bring the ancestor keys of a moved folder's chunks in line with the tree, without re-embedding.
+
+    Each chunk below the folder gets the keys of its own folder's current path,
+    and keys of ancestors it no longer has are removed. Working from the tree
+    rather than from the move makes this idempotent, so an interrupted rewrite is
+    finished by running it again. Once every chunk is done, the pending move
+    `marker` is cleared and kb_version bumped, dropping results cached meanwhile.
+    """
+    batch_size = app.config["VECTOR_BATCH_SIZE"]
+    paths = {}
+    offset = 0
+    while True:
+        # Every chunk keeps this folder's own key, so paging by offset is stable
+        batch = collection.get(
+            where={ancestor_key(folder_id): True}, include=["metadatas"], limit=batch_size, offset=offset
+        )
+        if not batch["ids"]:
+            break
+        metadatas = []
+        for metadata in batch["metadatas"]:
+            chunk_folder_id = metadata.get("folder_id", "root")
+            if chunk_folder_id not in paths:
+                paths[chunk_folder_id] = folder_ancestor_metadata(chunk_folder_id)
+            changes = dict(paths[chunk_folder_id])
+            changes.update({
+                key: None for key in metadata if key.startswith(ancestor_key("")) and key not in changes
+            })
+            metadatas.append(changes)
+        collection.update(ids=batch["ids"], metadatas=metadatas)
+        offset += len(batch["ids"])
+    document_db.finish_folder_move(folder_id, marker)
+
+
+def retry_folder_move(folder_id, marker, attempts=3, delay=2.0):
+    """Retry a failed ancestor rewrite in the background, backing off between attempts"""
+    for attempt in range(attempts):
+        time.sleep(delay * (2 ** attempt))
+        try:
+            move_folder_vectors(folder_id, marker)
+            logger.info(f"Updated vectors of moved folder {folder_id} on retry")
+            return
+        except Exception as e:
+            logger.error(f"Retry {attempt + 1} of updating vectors of moved folder {folder_id} failed: {e}")
+    # Still pending; resume_folder_moves finishes it at the next startup
+
+
+def resume_folder_moves():
+    """Finish the vector metadata rewrites of folder moves that were interrupted, e.g. by a restart"""
+    try:
+        for folder_id, marker in document_db.get_pending_folder_moves():
+            logger.info(f"Resuming ancestor rewrite of moved folder {folder_id}")
+            move_folder_vectors(folder_id, marker)
+    except Exception as e:
+        logger.error(f"Resuming folder moves failed: {e}")
+
+
+ingestion_queue = IngestionJobQueue(ingest_file, max_workers=app.config["INGEST_WORKERS"])
+if collection:
+    ingestion_queue.executor.submit(backfill_lexical_index)
+    ingestion_queue.executor.submit(resume_folder_moves)
+    ingestion_queue.executor.submit(backfill_folder_ancestors)
+
+
 # Routes
 @app.route("/")
 def index():
@@ -329,13 +965,32 @@ def settings_page():
     return render_template("settings.html")
 
 
+def tree_not_modified():
+    """ETag for responses derived from the folder tree, and a 304 response if the client has it"""
+    etag = f"tree-{document_db.get_tree_version()}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return etag, response
+    return etag, None
+
+
+def tree_response(data, etag):
+    response = jsonify(data)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
 # API Routes
 @app.route("/api/all-documents-and-folders")
 def get_all_documents_and_folders():
     """Get all documents and folders for context selection"""
     try:
-        data = document_db.get_all_folders_and_files()
-        return jsonify(data)
+        etag, not_modified = tree_not_modified()
+        if not_modified:
+            return not_modified
+        return tree_response(document_db.get_all_folders_and_files(), etag)
     except Exception as e:
         logger.error(f"Error getting all documents and folders: {e}")
         return jsonify({"error": "Failed to load documents and folders"}), 500
@@ -345,6 +1000,10 @@ def get_all_documents_and_folders():
 def get_folder_contents(folder_id):
     """Get folder contents"""
     try:
+        etag, not_modified = tree_not_modified()
+        if not_modified:
+            return not_modified
+
         folder = document_db.get_folder(folder_id)
         if not folder:
             return jsonify({"error": "Folder not found"}), 404
@@ -352,14 +1011,34 @@ def get_folder_contents(folder_id):
         subfolders, files = document_db.get_folder_children(folder_id)
         breadcrumb = document_db.build_breadcrumb(folder_id)
 
-        return jsonify(
-            {"folder": folder, "breadcrumb": breadcrumb, "contents": subfolders + files}
+        return tree_response(
+            {"folder": folder, "breadcrumb": breadcrumb, "contents": subfolders + files}, etag
         )
     except Exception as e:
         logger.error(f"Error getting folder contents: {e}")
         return jsonify({"error": "Failed to load folder"}), 500
 
 
+def validate_folder_name(folder_name, parent_id):
+    """Error message for a folder name that can't be used under `parent_id`, or None"""
+    if not folder_name:
+        return "Folder name required"
+
+    if len(folder_name) > 100:
+        return "Folder name too long"
+
+    # Check for invalid characters
+    invalid_chars = ["/", "\\", ":", "*", "?", '"', "<", ">", "|"]
+    if any(char in folder_name for char in invalid_chars):
+        return "Invalid characters in folder name"
+
+    # Check for duplicates
+    subfolders, _ = document_db.get_folder_children(parent_id)
+    if any(f["name"] == folder_name for f in subfolders):
+        return "Folder already exists"
+    return None
+
+
 @app.route("/api/folder", methods=["POST"])
 def create_folder():
     """Create new folder"""
@@ -368,21 +1047,9 @@ def create_folder():
         folder_name = data.get("name", "").strip()
         parent_id = data.get("parent_id", "root")
 
-        if not folder_name:
-            return jsonify({"error": "Folder name required"}), 400
-
-        if len(folder_name) > 100:
-            return jsonify({"error": "Folder name too long"}), 400
-
-        # Check for invalid characters
-        invalid_chars = ["/", "\\", ":", "*", "?", '"', "<", ">", "|"]
-        if any(char in folder_name for char in invalid_chars):
-            return jsonify({"error": "Invalid characters in folder name"}), 400
-
-        # Check for duplicates
-        subfolders, _ = document_db.get_folder_children(parent_id)
-        if any(f["name"] == folder_name for f in subfolders):
-            return jsonify({"error": "Folder already exists"}), 400
+        error = validate_folder_name(folder_name, parent_id)
+        if error:
+            return jsonify({"error": error}), 400
 
         # Create folder
         folder_id = document_db.add_folder(folder_name, parent_id)
@@ -398,9 +1065,77 @@ def create_folder():
         return jsonify({"error": "Failed to create folder"}), 500
 
 
+@app.route("/api/folder/<folder_id>", methods=["PATCH"])
+def update_folder(folder_id):
+    """Rename a folder and/or move it under another parent"""
+    try:
+        if folder_id == "root":
+            return jsonify({"error": "Cannot modify root folder"}), 400
+
+        folder = document_db.get_folder(folder_id)
+        if not folder:
+            return jsonify({"error": "Folder not found"}), 404
+
+        data = request.get_json() or {}
+        folder_name = data.get("name", folder["name"]).strip()
+        parent_id = data.get("parent_id", folder["parent"])
+
+        if folder_name != folder["name"] or parent_id != folder["parent"]:
+            error = validate_folder_name(folder_name, parent_id)
+            if error:
+                return jsonify({"error": error}), 400
+
+        # Rename and move are applied together, so neither happens without the other
+        marker = None
+        if folder_name != folder["name"] or parent_id != folder["parent"]:
+            try:
+                marker = document_db.update_folder(
+                    folder_id,
+                    name=folder_name if folder_name != folder["name"] else None,
+                    parent_id=parent_id if parent_id != folder["parent"] else None,
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        folder_info = {"id": folder_id, "name": folder_name, "parent_id": parent_id}
+        # Chunks carry their folder ancestry; update it in place rather than re-embedding
+        if marker is not None and collection:
+            try:
+                move_folder_vectors(folder_id, marker)
+            except Exception as e:
+                logger.error(f"Error updating vectors of moved folder {folder_id}: {e}")
+                ingestion_queue.executor.submit(retry_folder_move, folder_id, marker)
+                return jsonify(
+                    {
+                        "message": "Folder updated; search results are updated in the background",
+                        "folder": folder_info,
+                        "pending_move": True,
+                    }
+                ), 202
+
+        return jsonify(
+            {
+                "message": "Folder updated successfully",
+                "folder": folder_info,
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error updating folder: {e}")
+        return jsonify({"error": "Failed to update folder"}), 500
+
+
+def delete_file_vectors(file_ids):
+    """Delete the ChromaDB chunks of many files, a batch of file ids per call"""
+    batch_size = app.config["VECTOR_BATCH_SIZE"]
+    for start in range(0, len(file_ids), batch_size):
+        batch = file_ids[start:start + batch_size]
+        where = {"file_id": batch[0]} if len(batch) == 1 else {"file_id": {"$in": batch}}
+        collection.delete(where=where)
+
+
 @app.route("/api/folder/<folder_id>", methods=["DELETE"])
 def delete_folder(folder_id):
-    """Delete folder"""
+    """Delete a folder, its subfolders and all their files"""
     try:
         if folder_id == "root":
             return jsonify({"error": "Cannot delete root folder"}), 400
@@ -408,16 +1143,32 @@ def delete_folder(folder_id):
         if not document_db.get_folder(folder_id):
             return jsonify({"error": "Folder not found"}), 404
 
+        removed = document_db.delete_folder(folder_id)
+
         # Also delete from ChromaDB
-        if collection:
+        if collection and removed["file_ids"]:
             try:
-                collection.delete(where={"folder_id": folder_id})
-            except:
-                pass
-
-        document_db.delete_folder(folder_id)
-
-        return jsonify({"message": f"Folder deleted"})
+                delete_file_vectors(removed["file_ids"])
+            except Exception as e:
+                logger.error(f"Error deleting vectors of folder {folder_id}: {e}")
+            finally:
+                # Queries made while the vectors were going away may have cached
+                # hits from the deleted files under the version bumped above
+                document_db.bump_kb_version()
+
+        # Each non-root folder keeps its uploads in a directory named after its id
+        for removed_id in removed["folder_ids"]:
+            folder_path = os.path.join(app.config["UPLOAD_FOLDER"], removed_id)
+            if os.path.isdir(folder_path):
+                shutil.rmtree(folder_path, ignore_errors=True)
+
+        logger.info(f"Deleted folder {folder_id}: {len(removed['folder_ids'])} folders, "
+                    f"{len(removed['file_ids'])} files")
+        return jsonify({
+            "message": f"Folder deleted",
+            "deleted_folders": len(removed["folder_ids"]),
+            "deleted_files": len(removed["file_ids"]),
+        })
     except Exception as e:
         logger.error(f"Error deleting folder: {e}")
         return jsonify({"error": "Failed to delete folder"}), 500
@@ -425,144 +1176,105 @@ def delete_folder(folder_id):
 
 @app.route("/api/upload", methods=["POST"])
 def upload_file():
+    """Save uploaded files and queue them for background ingestion"""
     try:
-        print(f"Upload request received")
-        print(f"Files in request: {list(request.files.keys())}")
-        print(f"Form data: {dict(request.form)}")
-
         if not collection:
             return jsonify({"error": "ChromaDB not available"}), 500
 
         if "file" not in request.files:
-            print("No 'file' key in request.files")
             return jsonify({"error": "No file selected"}), 400
 
         files = request.files.getlist("file")
         folder_id = request.form.get("folder_id", "root")
 
-        print(f"Number of files: {len(files)}")
-        print(f"Folder ID: {folder_id}")
-
         if not files or all(f.filename == "" for f in files):
-            print("No files or empty filenames")
             return jsonify({"error": "No files selected"}), 400
 
         # Check if folder exists in SQLite
         if not document_db.get_folder(folder_id):
             return jsonify({"error": "Folder not found"}), 404
 
-        os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+        # Determine the folder path within UPLOAD_FOLDER
+        # If folder_id is 'root', save directly in UPLOAD_FOLDER
+        # Otherwise, create a subdirectory for the folder_id
+        if folder_id == "root":
+            target_folder_path = app.config["UPLOAD_FOLDER"]
+        else:
+            target_folder_path = os.path.join(app.config["UPLOAD_FOLDER"], folder_id)
+        os.makedirs(target_folder_path, exist_ok=True)
 
-        uploaded_files = []
-        total_chunks = 0
+        saved_files = []
+        skipped_files = []
 
         for file in files:
             if not file.filename or not allowed_file(file.filename):
+                skipped_files.append(file.filename)
                 continue
 
             try:
                 filename = secure_filename(file.filename)
-                file_extension = filename.rsplit(".", 1)[1].lower()
-
-                # Determine the folder path within UPLOAD_FOLDER
-                # If folder_id is 'root', save directly in UPLOAD_FOLDER
-                # Otherwise, create a subdirectory for the folder_id
-                if folder_id == "root":
-                    target_folder_path = app.config["UPLOAD_FOLDER"]
-                else:
-                    target_folder_path = os.path.join(app.config["UPLOAD_FOLDER"], folder_id)
-                    os.makedirs(target_folder_path, exist_ok=True) # Ensure folder exists
-
-                # Define permanent file path
                 file_save_path = os.path.join(target_folder_path, filename)
                 file.save(file_save_path)
-
-                file_size = os.path.getsize(file_save_path)
-                file_hash = get_file_hash(file_save_path)
-
-                if not file_hash:
-                    os.remove(file_save_path) # Clean up if hash generation fails
-                    continue
-
-                # Process document
-                text_content = process_document(file_save_path, filename)
-                if not text_content:
-                    os.remove(file_save_path) # Clean up if text extraction fails
-                    continue
-
-                # Create chunks
-                chunks = chunk_text(text_content)
-                if not chunks:
-                    os.remove(file_save_path) # Clean up if chunking fails
-                    continue
-
-                # Add to ChromaDB
-                file_id = str(uuid.uuid4())
-                chunk_ids = []
-                chunk_texts = []
-                chunk_metadatas = []
-
-                for i, chunk in enumerate(chunks):
-                    chunk_id = f"{file_id}_chunk_{i}"
-                    chunk_ids.append(chunk_id)
-                    chunk_texts.append(chunk)
-                    chunk_metadatas.append(
-                        {
-                            "file_id": file_id,
-                            "filename": filename,
-                            "chunk_index": i,
-                            "folder_id": folder_id,
-                            "file_extension": file_extension,
-                            "upload_date": datetime.now().isoformat(),
-                        }
-                    )
-
-                collection.add(
-                    ids=chunk_ids, documents=chunk_texts, metadatas=chunk_metadatas
-                )
-
-                # Add to SQLite document storage
-                file_info = {
-                    "id": file_id,
-                    "name": filename,
-                    "extension": file_extension,
-                    "size": file_size,
-                    "hash": file_hash,
-                    "folder_id": folder_id,
-                    "chunk_count": len(chunks),
-                    "created_at": datetime.now().isoformat(),
-                    "text_length": len(text_content),
-                }
-                document_db.add_file(file_info)
-
-                uploaded_files.append(filename)
-                total_chunks += len(chunks)
-
-                # No cleanup needed, file is permanently stored
-
+                saved_files.append((filename, file_save_path))
             except Exception as e:
-                logger.error(f"Error processing {file.filename}: {e}")
-                # Ensure cleanup of the permanently saved file if an error occurs during processing
-                if "file_save_path" in locals() and os.path.exists(file_save_path):
-                    os.remove(file_save_path)
-                continue
+                logger.error(f"Error saving {file.filename}: {e}")
+                skipped_files.append(file.filename)
 
-        if not uploaded_files:
+        if not saved_files:
             return jsonify({"error": "No files processed successfully"}), 400
 
+        job = ingestion_queue.submit(folder_id, saved_files)
+
         return jsonify(
             {
-                "message": f"Successfully uploaded {len(uploaded_files)} files",
-                "files": uploaded_files,
-                "total_chunks": total_chunks,
+                "message": f"Queued {len(saved_files)} files for processing",
+                "job_id": job.id,
+                "files": [filename for filename, _ in saved_files],
+                "skipped": skipped_files,
+                "status_url": url_for("get_job", job_id=job.id),
+                "events_url": url_for("stream_job_events", job_id=job.id),
             }
-        )
+        ), 202
 
     except Exception as e:
         logger.error(f"Upload error: {e}")
         return jsonify({"error": "Upload failed"}), 500
 
 
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    """Get the status of an ingestion job"""
+    job = ingestion_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/api/jobs/<job_id>/events")
+def stream_job_events(job_id):
+    """Stream ingestion job progress as Server-Sent Events"""
+    job = ingestion_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        version = -1
+        while True:
+            snapshot, version = ingestion_queue.wait_for_update(job_id, version)
+            if snapshot is None:
+                yield sse_event("error", {"error": "Job not found"})
+                return
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] in ("completed", "failed"):
+                return
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/api/file/<file_id>", methods=["DELETE"])
 def delete_file(file_id):
     """Delete a file"""
@@ -602,6 +1314,18 @@ def delete_file(file_id):
         return jsonify({"error": "Failed to delete file"}), 500
 
 
+def get_extracted_text(file_info, file_path):
+    """Get a file's stored extracted text, extracting and storing it if it predates the text store"""
+    compressed_text = document_db.get_file_text(file_info["id"])
+    if compressed_text is not None:
+        return zlib.decompress(compressed_text).decode("utf-8")
+
+    content = process_document(file_path, file_info["name"])
+    if content:
+        document_db.save_file_text(file_info["id"], zlib.compress(content.encode("utf-8")))
+    return content
+
+
 @app.route("/api/file-content/<file_id>")
 def get_file_content(file_id):
     """Get the content of a specific file or serve the file directly if it's a PDF."""
@@ -623,14 +1347,33 @@ def get_file_content(file_id):
         file_extension = file_info["extension"].lower()
 
         if file_extension == "pdf":
-            # Serve PDF files directly
-            return send_file(file_path, mimetype='application/pdf')
+            # Serve PDF files directly; conditional GET and byte ranges are handled by send_file
+            return send_file(file_path, mimetype='application/pdf', conditional=True, etag=file_info["hash"])
         elif file_extension in ["txt", "md", "csv", "json", "docx", "pptx"]:
-            # For other allowed text-based files, extract and return content
-            content = process_document(file_path, file_info["name"])
+            # For other allowed text-based files, return the text extracted at upload time
+            etag = f"{file_info['hash']}-text"
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            content = get_extracted_text(file_info, file_path)
             if not content:
                 return jsonify({"error": "Could not extract content from file"}), 500
-            return jsonify({"content": content})
+
+            # Raw text (format=text, or any Range request) supports byte ranges; the JSON
+            # form used by the viewer only supports conditional GET
+            if request.args.get("format") == "text" or "Range" in request.headers:
+                body = content.encode("utf-8")
+                response = Response(body, mimetype="text/plain; charset=utf-8")
+                response.set_etag(etag)
+                response.cache_control.no_cache = True
+                return response.make_conditional(request, accept_ranges=True, complete_length=len(body))
+
+            response = jsonify({"content": content})
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
         else:
             return jsonify({"error": "Unsupported file type for direct content display"}), 400
 
@@ -639,21 +1382,64 @@ def get_file_content(file_id):
         return jsonify({"error": "Failed to retrieve file content"}), 500
 
 
+@app.route("/healthz")
+def healthz():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness probe: each SQLite store answers a query and ChromaDB a heartbeat. Reads no documents."""
+
+    def chromadb_ready():
+        if collection is None:
+            raise RuntimeError("not initialized")
+        chroma_client.heartbeat()
+
+    def store_ready(storage):
+        with storage.pool.connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+
+    probes = {
+        "chromadb": chromadb_ready,
+        "documents": lambda: store_ready(document_db),
+        "conversations": lambda: store_ready(conversation_db),
+        "settings": lambda: store_ready(llm_settings_db),
+    }
+    checks = {}
+    failing = []
+    for name, probe in probes.items():
+        try:
+            probe()
+            checks[name] = True
+        except Exception as e:
+            logger.warning(f"Readiness check {name} failed: {e}")
+            checks[name] = False
+            failing.append(name)
+    if failing:
+        return jsonify({"status": "not_ready", "failing": failing, "checks": checks}), 503
+    return jsonify({"status": "ready", "checks": checks}), 200
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.route("/api/stats")
 def get_stats():
     """Get RAGFuse statistics"""
     try:
+        # Maintained totals, including the chunk count, so no table or collection scan
         stats = document_db.get_stats()
-
-        # Add ChromaDB chunk count
-        try:
-            collection_count = collection.count() if collection else 0
-        except Exception as e:
-            logger.warning(f"Error getting ChromaDB count: {e}")
-            collection_count = 0
-
-        stats["total_chunks"] = collection_count
-        stats["storage_location"] = "/app/chroma_data"
+        stats["storage_location"] = CHROMA_DATA_DIR
+        stats["retrieval_cache"] = {
+            "results": retrieval_cache.stats(),
+            "query_embeddings": query_embedding_cache.stats(),
+        }
+        stats["web_search_cache"] = web_search.cache.stats()
 
         return jsonify(stats)
 
@@ -688,45 +1474,33 @@ def search_knowledge_base():
         if not query:
             return jsonify({"error": "Query required"}), 400
 
-        # Build where clause
-        where_clause = {}
-        if selected_document_ids:
-            where_clause["file_id"] = {"$in": selected_document_ids}
-        elif folder_id and folder_id != "root":
-            where_clause["folder_id"] = folder_id
-
         # Search
-        if where_clause:
-            results = collection.query(
-                query_texts=[query], n_results=n_results, where=where_clause
-            )
-        else:
-            results = collection.query(query_texts=[query], n_results=n_results)
+        hits, retrieval = retrieve_chunks(
+            query, n_results, selected_document_ids, folder_id, data.get("retrieval_mode"), data.get("rerank")
+        )
 
         # Format results
         search_results = []
-        if results["documents"][0]:
-            for doc, metadata, distance in zip(
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0],
-            ):
-                search_results.append(
-                    {
-                        "content": doc,
-                        "filename": metadata["filename"],
-                        "chunk_index": metadata["chunk_index"],
-                        "folder_id": metadata["folder_id"],
-                        "similarity_score": 1 - distance,
-                        "upload_date": metadata["upload_date"],
-                    }
-                )
+        for hit in hits:
+            search_results.append(
+                {
+                    "content": hit["content"],
+                    "filename": hit["filename"],
+                    "chunk_index": hit["chunk_index"],
+                    "folder_id": hit["folder_id"],
+                    "similarity_score": hit["similarity"],
+                    "upload_date": hit["upload_date"],
+                    "match": hit["match"],
+                }
+            )
 
         return jsonify(
             {
                 "results": search_results,
                 "query": query,
                 "total_results": len(search_results),
+                "retrieval_mode": retrieval["mode"],
+                "rerank": retrieval["rerank"],
             }
         )
 
@@ -735,161 +1509,255 @@ def search_knowledge_base():
         return jsonify({"error": "Search failed"}), 500
 
 
-@app.route("/api/chat", methods=["POST"])
-def chat():
-    try:
-        if not collection:
-            return jsonify({"error": "ChromaDB not available"}), 500
+# Retrieval, web search and LLM client setup are independent, so chat runs them
+# side by side; each has its own deadline and a slow stage degrades the answer
+# instead of stalling it. Every stage gets its own pool, so a backlog in one
+# (say, a slow web search backend) cannot hold the threads another needs.
+chat_executors = {
+    stage: ThreadPoolExecutor(max_workers=app.config["CHAT_STAGE_WORKERS"], thread_name_prefix=f"chat-{stage}")
+    for stage in ("retrieval", "web_search", "llm_setup")
+}
 
-        data = request.get_json()
-        message = data.get("message", "").strip()
-        folder_id = data.get("folder_id")
-        conv_id = data.get("conversation_id")  # Get existing conversation ID
-        llm_provider = data.get("llm_provider", "openai") # Get selected LLM provider
-        web_search_enabled = data.get("web_search_enabled", False)
 
-        if not message:
-            return jsonify({"error": "Message required"}), 400
+def timed_stage(fn, *args, **kwargs):
+    """Run fn and return its result along with the elapsed milliseconds"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round((time.perf_counter() - start) * 1000, 2)
 
-        # Get current conversation history
-        messages = []
-        if conv_id:
-            messages = conversation_db.get_conversation(conv_id)
 
-        # Add user message
-        messages.append(
-            {
-                "role": "user",
-                "content": message,
-                "timestamp": datetime.now().isoformat(),
-            }
-        )
+def await_stage(name, future, timeout, timings):
+    """Wait for a chat stage started with timed_stage and record its timing.
 
-        # Prepare context from ChromaDB
-        where_clause = {}
-        selected_document_ids = data.get("selected_documents", [])
+    Raises TimeoutError (recording "timeout") if it does not finish in time, and
+    cancels the stage if it is still queued; exceptions raised by the stage
+    itself propagate.
+    """
+    try:
+        result, elapsed_ms = future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        future.cancel()
+        timings[name] = "timeout"
+        errors.inc(stage=name[:-3] if name.endswith("_ms") else name)
+        logger.warning(f"Chat stage {name} timed out after {timeout}s")
+        raise TimeoutError(f"{name} timed out")
+    timings[name] = elapsed_ms
+    return result
+
+
+def resolve_turn_llm(turn):
+    """Return the LLM client being set up for a chat turn.
+
+    Setup errors (e.g. ValueError for a missing API key) are raised here. Either
+    way, the time spent before the LLM call is recorded in the turn's timings.
+    """
+    try:
+        return await_stage("llm_setup_ms", turn["llm_future"], app.config["LLM_SETUP_TIMEOUT"], turn["timings"])
+    finally:
+        turn["timings"]["prepare_ms"] = round((time.perf_counter() - turn["started"]) * 1000, 2)
+        logger.info(f"Chat stage timings: {turn['timings']}")
 
-        if selected_document_ids:
-            # If specific documents are selected, filter by them
-            where_clause["file_id"] = {"$in": selected_document_ids}
-        elif folder_id and folder_id != "root":
-            # If a folder is selected but no specific documents, filter by folder
-            where_clause["folder_id"] = folder_id
 
-        # Prepare context from ChromaDB
-        where_clause = {}
-        selected_document_ids = data.get("selected_documents", [])
+def prepare_chat_turn(data):
+    """Gather everything needed to answer a chat message before calling the LLM.
 
-        if selected_document_ids:
-            # If specific documents are selected, filter by them
-            where_clause["file_id"] = {"$in": selected_document_ids}
-        elif folder_id and folder_id != "root":
-            # If a folder is selected but no specific documents, filter by folder
-            where_clause["folder_id"] = folder_id
+    Returns a dict with the new user message, the packed context parts and their
+    sources, the prompt to send with the recent history that fits its budget, the
+    LLM client being set up (resolve it with resolve_turn_llm) and per-stage timings.
+    """
+    started = time.perf_counter()
+    message = data.get("message", "").strip()
+    folder_id = data.get("folder_id")
+    conv_id = data.get("conversation_id")  # Get existing conversation ID
+    web_search_enabled = data.get("web_search_enabled", False)
+    selected_document_ids = data.get("selected_documents", [])
+    timings = {}
+
+    llm_provider = data.get("llm_provider", "openai")
+    llm_future = chat_executors["llm_setup"].submit(timed_stage, get_llm_instance, llm_provider)
+    retrieval_future = None
+    if collection:
+        # If no folder or specific documents are selected, search all
+        retrieval_future = chat_executors["retrieval"].submit(
+            timed_stage, retrieve_chunks,
+            message, app.config["CHAT_CONTEXT_CHUNKS"], selected_document_ids, folder_id,
+            data.get("retrieval_mode"), data.get("rerank"),
+        )
+    web_future = None
+    if web_search_enabled:
+        web_future = chat_executors["web_search"].submit(timed_stage, duckduckgo_web_search, query=message)
+
+    # Only the latest turns are sent to the LLM; the new turn is appended once answered
+    history = []
+    if conv_id:
+        history = conversation_db.get_conversation(conv_id, limit=app.config["HISTORY_MAX_MESSAGES"])
+    else:
+        # Generate new conversation ID
+        conv_id = "conv_" + uuid.uuid4().hex
+
+    # Add user message
+    messages = [
+        {
+            "role": "user",
+            "content": message,
+            "timestamp": datetime.now().isoformat(),
+        }
+    ]
+
+    # Prepare context from the knowledge base
+    document_hits = []
+    document_sources = []
+
+    retrieval = None
+    if retrieval_future:
+        try:
+            hits, retrieval = await_stage(
+                "retrieval_ms", retrieval_future, app.config["RETRIEVAL_TIMEOUT"], timings
+            )
+        except TimeoutError:
+            hits = []
+        document_hits = hits
+        for hit in hits:
+            document_sources.append(
+                {
+                    "filename": hit["filename"],
+                    "chunk_index": hit["chunk_index"],
+                    "similarity": hit["similarity"],
+                    "type": "document",
+                }
+            )
+    logger.info(f"Document sources prepared: {document_sources}")
 
-        document_context_parts = []
-        document_sources = []
+    web_search_results = []
+    web_search_sources = []
+    if web_future:
+        try:
+            web_results = await_stage(
+                "web_search_ms", web_future, app.config["WEB_SEARCH_TIMEOUT"], timings
+            )
+            if web_results and web_results.get("search_results"):
+                for i, result in enumerate(web_results["search_results"][:3]): # Limit to top 3 web results
+                    web_search_results.append(f"Title: {result.get('title')}\nURL: {result.get('link')}\nSnippet: {result.get('snippet')}")
+                    web_search_sources.append({
+                        "filename": result.get('title', f"Web Result {i+1}"),
+                        "url": result.get('link'),
+                        "type": "web",
+                        "snippet": result.get('snippet')
+                    })
+            logger.info(f"Web search results: {web_search_results}")
+        except TimeoutError:
+            # Answer from the documents alone rather than keep the user waiting
+            pass
+        except Exception as e:
+            logger.error(f"Web search error: {e}")
+            web_search_results = [f"Error performing web search: {e}"]
+
+    # Combine contexts and sources
+    all_sources = document_sources + web_search_sources
+
+    custom_prompt_template = llm_settings_db.get_setting("custom_llm_prompt")
+
+    def build_prompt(context_parts):
+        if context_parts:
+            context_str = '\n\n'.join(context_parts)
+            if custom_prompt_template:
+                return custom_prompt_template.replace("{{context}}", context_str).replace("{{query}}", message)
+            return f"Given the following context:\n\n{context_str}\n\nAnswer the question: {message}"
+        if custom_prompt_template:
+            return custom_prompt_template.replace("{{context}}", "").replace("{{query}}", message)
+        return message
+
+    # Fit the prompt into the model's budget: the providers' system prompt, the
+    # question and template first, then recent history (up to its share), then
+    # merged context parts in rank order. Every message also costs its framing.
+    budget = min(
+        app.config["PROMPT_TOKEN_BUDGET"],
+        context_window(llm_provider, get_llm_model(llm_provider)) - app.config["RESPONSE_TOKEN_RESERVE"],
+    )
+    remaining = (budget - estimate_tokens(LLM.SYSTEM_PROMPT) - estimate_tokens(build_prompt(["x"]))
+                 - 2 * MESSAGE_OVERHEAD_TOKENS)
+    history = window_history(
+        history, max(0, int(remaining * app.config["HISTORY_TOKEN_SHARE"])), MESSAGE_OVERHEAD_TOKENS
+    )
+    remaining -= sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in history)
+    context_blocks = merge_hits(document_hits + [{"content": part} for part in web_search_results])
+    all_context_parts = pack_context([block["content"] for block in context_blocks], remaining)
+    rag_prompt = build_prompt(all_context_parts)
+
+    return {
+        "conversation_id": conv_id,
+        "messages": messages,
+        "context_parts": all_context_parts,
+        "sources": all_sources,
+        "prompt": rag_prompt,
+        "history": history,
+        "selected_documents": selected_document_ids,
+        "retrieval": retrieval,
+        "llm_provider": llm_provider,
+        "llm_future": llm_future,
+        "timings": timings,
+        "started": started,
+    }
+
+
+def finish_chat_turn(turn, bot_response):
+    """Append the user message and bot response to the stored conversation"""
+    turn["messages"].append(
+        {
+            "role": "bot",
+            "content": bot_response,
+            "timestamp": datetime.now().isoformat(),
+            "sources": turn["sources"], # Include all sources
+            "context_parts": turn["context_parts"], # Include all context parts
+        }
+    )
+    conversation_db.append_messages(
+        turn["conversation_id"], turn["messages"], selected_documents=turn["selected_documents"]
+    )
 
-        if collection:
-            if where_clause:
-                results = collection.query(
-                    query_texts=[message], n_results=3, where=where_clause
-                )
-            else:
-                # If no folder or specific documents are selected, search all
-                results = collection.query(query_texts=[message], n_results=3)
-
-            logger.info(f"ChromaDB query results: {results}")
-
-            if results["documents"] and results["documents"][0]:
-                for doc, metadata, distance in zip(
-                    results["documents"][0],
-                    results["metadatas"][0],
-                    results["distances"][0],
-                ):
-                    document_context_parts.append(doc)
-                    document_sources.append(
-                        {
-                            "filename": metadata["filename"],
-                            "chunk_index": metadata["chunk_index"],
-                            "similarity": 1 - distance,
-                            "type": "document",
-                        }
-                    )
-        logger.info(f"Document sources prepared: {document_sources}")
-
-        web_search_results = []
-        web_search_sources = []
-        if web_search_enabled:
-            try:
-                # Perform web search
-                web_results = duckduckgo_web_search(query=message)
-                if web_results and web_results.get("search_results"):
-                    for i, result in enumerate(web_results["search_results"][:3]): # Limit to top 3 web results
-                        web_search_results.append(f"Title: {result.get('title')}\nURL: {result.get('link')}\nSnippet: {result.get('snippet')}")
-                        web_search_sources.append({
-                            "filename": result.get('title', f"Web Result {i+1}"),
-                            "url": result.get('link'),
-                            "type": "web",
-                            "snippet": result.get('snippet')
-                        })
-                logger.info(f"Web search results: {web_search_results}")
-            except Exception as e:
-                logger.error(f"Web search error: {e}")
-                web_search_results = [f"Error performing web search: {e}"]
 
-        # Combine contexts and sources
-        all_context_parts = document_context_parts + web_search_results
-        all_sources = document_sources + web_search_sources
+@app.route("/api/chat", methods=["POST"])
+def chat():
+    try:
+        if not collection:
+            return jsonify({"error": "ChromaDB not available"}), 500
+
+        data = request.get_json()
+
+        if not data.get("message", "").strip():
+            return jsonify({"error": "Message required"}), 400
+
+        turn = prepare_chat_turn(data)
 
         # Generate LLM response
         try:
-            llm = get_llm_instance(llm_provider)
-            custom_prompt_template = llm_settings_db.get_setting("custom_llm_prompt")
-
-            if all_context_parts:
-                context_str = '\n\n'.join(all_context_parts)
-                if custom_prompt_template:
-                    rag_prompt = custom_prompt_template.replace("{{context}}", context_str).replace("{{query}}", message)
-                else:
-                    rag_prompt = f"Given the following context:\n\n{context_str}\n\nAnswer the question: {message}"
-                bot_response = llm.generate_response(prompt=rag_prompt, context=all_context_parts)
-            else:
-                if custom_prompt_template:
-                    rag_prompt = custom_prompt_template.replace("{{context}}", "").replace("{{query}}", message)
-                else:
-                    rag_prompt = message
-                bot_response = llm.generate_response(prompt=rag_prompt, context=[])
+            llm = resolve_turn_llm(turn)
+            with llm_generation_seconds.time(provider=turn["llm_provider"], streaming="false"):
+                bot_response = llm.generate_response(
+                    prompt=turn["prompt"], context=turn["context_parts"], history=turn["history"]
+                )
         except ValueError as ve:
             bot_response = f"LLM Configuration Error: {ve}. Please check your settings."
+        except LLMError as llm_e:
+            # Provider failures are shown as the answer, but still count as errors
+            errors.inc(stage="llm")
+            logger.error(f"LLM provider {turn['llm_provider']} failed: {llm_e}")
+            bot_response = str(llm_e)
         except Exception as llm_e:
+            errors.inc(stage="llm")
             bot_response = f"Error generating LLM response: {llm_e}"
 
-        # Add bot response
-        messages.append(
-            {
-                "role": "bot",
-                "content": bot_response,
-                "timestamp": datetime.now().isoformat(),
-                "sources": all_sources, # Include all sources
-                "context_parts": all_context_parts, # Include all context parts
-            }
-        )
-
-        # Save conversation
-        if not conv_id:
-            # Generate new conversation ID
-            conv_id = "conv_" + datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        conversation_db.save_conversation(conv_id, messages, selected_documents=data.get("selected_documents", []))
+        finish_chat_turn(turn, bot_response)
 
         return jsonify(
             {
                 "response": bot_response,
-                "sources": all_sources[:3],
-                "context_used": len(all_context_parts) > 0,
-                "context_parts": all_context_parts, # Include context parts
-                "conversation_id": conv_id,
+                "sources": turn["sources"][:3],
+                "context_used": len(turn["context_parts"]) > 0,
+                "context_parts": turn["context_parts"], # Include context parts
+                "conversation_id": turn["conversation_id"],
+                "retrieval": turn["retrieval"],
+                "timings": turn["timings"],
             }
         )
 
@@ -898,21 +1766,151 @@ def chat():
         return jsonify({"error": "Chat failed"}), 500
 
 
+def sse_event(event, payload):
+    """Format a Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """Chat with the response streamed as Server-Sent Events.
+
+    Emits a `sources` event first, then `token` events as the LLM generates,
+    and a final `done` event once the conversation has been saved.
+    """
+    try:
+        if not collection:
+            return jsonify({"error": "ChromaDB not available"}), 500
+
+        data = request.get_json()
+
+        if not data.get("message", "").strip():
+            return jsonify({"error": "Message required"}), 400
+
+        turn = prepare_chat_turn(data)
+    except Exception as e:
+        logger.error(f"Chat error: {e}")
+        return jsonify({"error": "Chat failed"}), 500
+
+    def generate():
+        yield sse_event("sources", {
+            "sources": turn["sources"][:3],
+            "context_used": len(turn["context_parts"]) > 0,
+            "context_parts": turn["context_parts"],
+            "conversation_id": turn["conversation_id"],
+            "retrieval": turn["retrieval"],
+        })
+
+        pieces = []
+        saved = False
+        try:
+            try:
+                llm = resolve_turn_llm(turn)
+                with llm_generation_seconds.time(provider=turn["llm_provider"], streaming="true"):
+                    for piece in llm.stream_response(
+                        prompt=turn["prompt"], context=turn["context_parts"], history=turn["history"]
+                    ):
+                        pieces.append(piece)
+                        yield sse_event("token", {"text": piece})
+            except ValueError as ve:
+                piece = f"LLM Configuration Error: {ve}. Please check your settings."
+                pieces.append(piece)
+                yield sse_event("token", {"text": piece})
+            except LLMError as llm_e:
+                errors.inc(stage="llm")
+                logger.error(f"LLM provider {turn['llm_provider']} failed: {llm_e}")
+                piece = str(llm_e)
+                pieces.append(piece)
+                yield sse_event("token", {"text": piece})
+            except Exception as llm_e:
+                errors.inc(stage="llm")
+                piece = f"Error generating LLM response: {llm_e}"
+                pieces.append(piece)
+                yield sse_event("token", {"text": piece})
+
+            finish_chat_turn(turn, "".join(pieces))
+            saved = True
+            yield sse_event("done", {"conversation_id": turn["conversation_id"], "timings": turn["timings"]})
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield sse_event("error", {"error": "Chat failed"})
+        finally:
+            # Keep whatever was generated if the client went away mid-stream
+            if not saved and pieces:
+                try:
+                    finish_chat_turn(turn, "".join(pieces))
+                except Exception as e:
+                    logger.error(f"Error saving interrupted conversation: {e}")
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def encode_cursor(values):
+    """Opaque pagination cursor for a keyset position"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+
+
+def page_size(default):
+    """The `limit` query parameter, clamped to 1..MAX_PAGE_SIZE"""
+    limit = request.args.get("limit", default=default, type=int)
+    return max(1, min(limit, app.config["MAX_PAGE_SIZE"]))
+
+
 @app.route("/api/conversations", methods=["GET"])
 def list_conversations():
+    """List conversations, newest first, one page at a time.
+
+    Pass the returned `next_cursor` as `cursor` to get the next page.
+    """
     try:
-        convs = conversation_db.get_all_conversations()
-        return jsonify({"conversations": convs})
+        limit = page_size(app.config["CONVERSATIONS_PAGE_SIZE"])
+        after = None
+        if request.args.get("cursor"):
+            try:
+                after = tuple(decode_cursor(request.args["cursor"]))
+            except Exception:
+                return jsonify({"error": "Invalid cursor"}), 400
+
+        # Fetch one extra row to know whether there is another page
+        convs = conversation_db.get_all_conversations(limit=limit + 1, after=after)
+        next_cursor = None
+        if len(convs) > limit:
+            convs = convs[:limit]
+            next_cursor = encode_cursor([convs[-1]["updated_at"], convs[-1]["conversation_id"]])
+        return jsonify({"conversations": convs, "next_cursor": next_cursor})
     except Exception as e:
         logger.error(f"Error listing conversations: {e}")
-        return jsonify({"conversations": []})  # Return empty list instead of error
+        return jsonify({"conversations": [], "next_cursor": None})  # Return empty list instead of error
 
 
 @app.route("/api/conversations/<conv_id>", methods=["GET"])
 def get_conversation(conv_id):
+    """Get a conversation's messages.
+
+    With `limit`, returns the latest messages (older than message id `before`,
+    if given); `next_before` is then the value to pass for the previous page.
+    """
     try:
-        messages = conversation_db.get_conversation(conv_id)
-        return jsonify({"conversation_id": conv_id, "messages": messages})
+        if "limit" not in request.args and "before" not in request.args:
+            messages = conversation_db.get_conversation(conv_id)
+            return jsonify({"conversation_id": conv_id, "messages": messages})
+
+        limit = page_size(app.config["MAX_PAGE_SIZE"])
+        before_id = request.args.get("before", type=int)
+        messages = conversation_db.get_conversation(conv_id, limit=limit + 1, before_id=before_id)
+        next_before = None
+        if len(messages) > limit:
+            messages = messages[1:]
+            next_before = messages[0]["id"]
+        return jsonify({"conversation_id": conv_id, "messages": messages, "next_before": next_before})
     except Exception as e:
         logger.error(f"Error fetching conversation {conv_id}: {e}")
         return jsonify({"error": "Failed to load conversation"}), 500
@@ -942,7 +1940,8 @@ def clear_database():
                 
                 # Recreate the collection
                 collection = chroma_client.get_or_create_collection(
-                    name="knowledge_base", metadata={"hnsw:space": "cosine"}
+                    name="knowledge_base", metadata={"hnsw:space": "cosine"},
+                    embedding_function=embedding_function,
                 )
                 logger.info("ChromaDB cleared and recreated successfully")
             except Exception as e:
@@ -951,16 +1950,7 @@ def clear_database():
         
         # Clear SQLite document storage (files and folders except root)
         try:
-            conn = document_db.conn
-            c = conn.cursor()
-            
-            # Delete all files
-            c.execute("DELETE FROM files")
-            
-            # Delete all folders except root
-            c.execute("DELETE FROM folders WHERE id != 'root'")
-            
-            conn.commit()
+            document_db.clear_all()
             logger.info("SQLite document storage cleared successfully")
 
             # Clear physical files from uploads folder
@@ -1008,8 +1998,9 @@ def get_llm_settings():
 def save_llm_settings():
     try:
         data = request.get_json()
-        for key, value in data.items():
-            llm_settings_db.save_setting(key, value)
+        llm_settings_db.save_settings(data)
+        # Don't keep clients (and their connections) built with replaced keys or models
+        llm_registry.invalidate()
         return jsonify({"message": "Settings saved successfully"}), 200
     except Exception as e:
         logger.error(f"Error saving LLM settings: {e}")
@@ -1031,7 +2022,3 @@ def not_found(e):
 def server_error(e):
     logger.error(f"Server error: {e}")
     return jsonify({"error": "Internal server error"}), 500
-
-
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
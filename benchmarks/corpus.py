@@ -0,0 +1,175 @@
+import csv
+import json
+import os
+import random
+import textwrap
+from typing import Dict, List
+
+import docx
+from pptx import Presentation
+from pptx.util import Inches
+
+SUPPORTED_TYPES = ("txt", "md", "csv", "json", "docx", "pptx", "pdf")
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zen", "qui", "dar", "sel", "bor", "fen", "gal", "hup", "tri"]
+_TOPICS = ["pump", "valve", "sensor", "turbine", "gearbox", "inverter", "battery", "compressor", "relay", "bearing"]
+_VERBS = ["monitors", "regulates", "reports", "limits", "calibrates", "controls", "logs", "isolates"]
+_OBJECTS = ["pressure", "temperature", "voltage", "flow rate", "vibration", "torque", "humidity", "load"]
+
+
+class SyntheticCorpus:
+    """Deterministic pseudo-technical documents for benchmarking.
+
+    Every document gets a unique part number (`PN-<doc>-<n>`) in some of its
+    sentences, so keyword queries have a known answer and no two documents share
+    a content hash (which would let ingestion deduplicate them).
+    """
+
+    def __init__(self, seed: int = 0, paragraphs: int = 20, sentences: int = 6):
+        self.random = random.Random(seed)
+        self.paragraphs = paragraphs
+        self.sentences = sentences
+        self.vocabulary = ["".join(self.random.choice(_SYLLABLES) for _ in range(self.random.randint(2, 4)))
+                           for _ in range(500)]
+
+    def sentence(self, doc_index: int) -> str:
+        r = self.random
+        subject = f"The {r.choice(self.vocabulary)} {r.choice(_TOPICS)}"
+        sentence = f"{subject} {r.choice(_VERBS)} the {r.choice(_OBJECTS)} of the {r.choice(self.vocabulary)} line"
+        if r.random() < 0.2:
+            sentence += f" under part number PN-{doc_index}-{r.randint(100, 999)}"
+        filler = " ".join(r.choice(self.vocabulary) for _ in range(r.randint(4, 12)))
+        return f"{sentence} with {filler}."
+
+    def document(self, doc_index: int) -> Dict:
+        paragraphs = [
+            " ".join(self.sentence(doc_index) for _ in range(self.sentences))
+            for _ in range(self.paragraphs)
+        ]
+        title = f"{self.random.choice(_TOPICS).title()} manual {doc_index}"
+        return {"title": title, "paragraphs": paragraphs}
+
+    def queries(self, documents: List[Dict], count: int) -> List[str]:
+        """Alternating keyword queries (part numbers) and natural-language questions"""
+        r = self.random
+        part_numbers = sorted({word.rstrip(".") for document in documents for paragraph in document["paragraphs"]
+                               for word in paragraph.split() if word.startswith("PN-")})
+        queries = []
+        for i in range(count):
+            if i % 2 == 0 and part_numbers:
+                queries.append(r.choice(part_numbers))
+            else:
+                queries.append(f"Which {r.choice(_TOPICS)} {r.choice(_VERBS)} the {r.choice(_OBJECTS)}?")
+        return queries
+
+
+def write_txt(path: str, document: Dict):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(document["title"] + "\n\n" + "\n\n".join(document["paragraphs"]))
+
+
+def write_md(path: str, document: Dict):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"# {document['title']}\n\n")
+        for i, paragraph in enumerate(document["paragraphs"]):
+            file.write(f"## Section {i + 1}\n\n{paragraph}\n\n")
+
+
+def write_csv(path: str, document: Dict):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["section", "text"])
+        for i, paragraph in enumerate(document["paragraphs"]):
+            writer.writerow([i + 1, paragraph])
+
+
+def write_json(path: str, document: Dict):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"title": document["title"], "sections": document["paragraphs"]}, file, indent=2)
+
+
+def write_docx(path: str, document: Dict):
+    doc = docx.Document()
+    doc.add_heading(document["title"], level=1)
+    for paragraph in document["paragraphs"]:
+        doc.add_paragraph(paragraph)
+    doc.save(path)
+
+
+def write_pptx(path: str, document: Dict):
+    prs = Presentation()
+    layout = prs.slide_layouts[6]  # blank
+    for i, paragraph in enumerate(document["paragraphs"]):
+        slide = prs.slides.add_slide(layout)
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6))
+        box.text_frame.word_wrap = True
+        box.text_frame.text = f"{document['title']} - slide {i + 1}\n{paragraph}"
+    prs.save(path)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, document: Dict, lines_per_page: int = 50):
+    """A plain text PDF with one Helvetica text object per page, written by hand"""
+    lines = [document["title"], ""]
+    for paragraph in document["paragraphs"]:
+        lines.extend(textwrap.wrap(paragraph, 95))
+        lines.append("")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    # 1: catalog, 2: page tree, 3: font, then a page and a content stream per page
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for n, page_lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * n, 5 + 2 * n
+        kids.append(f"{page_id} 0 R")
+        text = "".join(f"({_pdf_escape(line)}) '\n" for line in page_lines)
+        stream = f"BT /F1 10 Tf 14 TL 50 780 Td\n{text}ET".encode("latin-1", "replace")
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[object_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as file:
+        file.write(bytes(out))
+
+
+WRITERS = {
+    "txt": write_txt,
+    "md": write_md,
+    "csv": write_csv,
+    "json": write_json,
+    "docx": write_docx,
+    "pptx": write_pptx,
+    "pdf": write_pdf,
+}
+
+
+def generate_corpus(directory: str, corpus: SyntheticCorpus, docs_per_type: int,
+                    types=SUPPORTED_TYPES) -> List[Dict]:
+    """Write `docs_per_type` documents of each type; returns their paths and contents"""
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    doc_index = 0
+    for file_type in types:
+        for _ in range(docs_per_type):
+            document = corpus.document(doc_index)
+            filename = f"doc_{doc_index:05d}.{file_type}"
+            path = os.path.join(directory, filename)
+            WRITERS[file_type](path, document)
+            files.append({"path": path, "filename": filename, "type": file_type,
+                          "size": os.path.getsize(path), "document": document})
+            doc_index += 1
+    return files
@@ -0,0 +1,318 @@
+"""Offline ingest-and-query benchmark.
+
+Generates a synthetic corpus, then measures text extraction, chunking, ingestion
+through /api/upload (chunking, embedding and ChromaDB indexing), /api/search,
+/api/chat and /api/chat/stream, all in-process through the Flask test client.
+Chat uses the offline "mock" LLM provider by default, with no generation delay,
+so the numbers are the server's own overhead. The app's data lives in a scratch
+directory, so the benchmark never touches a real knowledge base. Results are
+printed (or written) as JSON so runs on different commits can be compared:
+
+    python -m benchmarks.run --docs-per-type 5 --queries 50 --output before.json
+
+The embedding and chunker models must already be downloaded; no network access
+is needed otherwise.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .corpus import SUPPORTED_TYPES, SyntheticCorpus, generate_corpus
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def latency_summary(samples_ms: List[float]) -> Dict:
+    """Count, mean and nearest-rank p50/p95/p99/max of latencies in milliseconds"""
+    if not samples_ms:
+        return {"count": 0}
+    ordered = sorted(samples_ms)
+
+    def percentile(p):
+        return round(ordered[max(0, -(-len(ordered) * p // 100) - 1)], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def peak_rss_mb() -> Dict:
+    """Peak resident set size of this process and of its (PDF extraction) children"""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def rate(count, seconds):
+    return round(count / seconds, 3) if seconds > 0 else None
+
+
+def bench_extraction(ragfuse, files) -> Dict:
+    texts = []
+    start = time.perf_counter()
+    for file in files:
+        texts.append(ragfuse.process_document(file["path"], file["filename"]) or "")
+    elapsed = time.perf_counter() - start
+    return {
+        "docs": len(files),
+        "bytes": sum(file["size"] for file in files),
+        "chars": sum(len(text) for text in texts),
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": rate(len(files), elapsed),
+    }, texts
+
+
+def bench_chunking(ragfuse, texts) -> Dict:
+    chunks = 0
+    start = time.perf_counter()
+    for text in texts:
+        chunks += len(ragfuse.chunk_text(text))
+    elapsed = time.perf_counter() - start
+    return {"docs": len(texts), "chunks": chunks, "seconds": round(elapsed, 3), "chunks_per_sec": rate(chunks, elapsed)}
+
+
+def bench_ingestion(ragfuse, client, files, batch_size) -> Dict:
+    """Upload the corpus through /api/upload and wait for every job to finish"""
+    job_ids = []
+    start = time.perf_counter()
+    for i in range(0, len(files), batch_size):
+        handles = [open(file["path"], "rb") for file in files[i:i + batch_size]]
+        try:
+            response = client.post(
+                "/api/upload",
+                data={"file": [(handle, file["filename"]) for handle, file in zip(handles, files[i:i + batch_size])],
+                      "folder_id": "root"},
+                content_type="multipart/form-data",
+            )
+        finally:
+            for handle in handles:
+                handle.close()
+        if response.status_code != 202:
+            raise RuntimeError(f"Upload failed: {response.get_json()}")
+        job_ids.append(response.get_json()["job_id"])
+
+    jobs = []
+    for job_id in job_ids:
+        version = -1
+        while True:
+            snapshot, version = ragfuse.ingestion_queue.wait_for_update(job_id, version)
+            if snapshot["status"] in ("completed", "failed"):
+                jobs.append(snapshot)
+                break
+    elapsed = time.perf_counter() - start
+
+    file_results = [file for job in jobs for file in job["files"]]
+    indexed = [file for file in file_results if file["stage"] != "failed"]
+    chunks = sum(file["chunk_count"] for file in indexed)
+    return {
+        "docs": len(files),
+        "failed": len(file_results) - len(indexed),
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": rate(len(indexed), elapsed),
+        "chunks_per_sec": rate(chunks, elapsed),
+    }
+
+
+def run_concurrently(app, payloads, concurrency, request):
+    """Call request(client, payload) for every payload from `concurrency` threads, one client each.
+
+    Returns the per-request results and the wall-clock seconds taken.
+    """
+    local = threading.local()
+
+    def call(payload):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        return request(local.client, payload)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, payloads))
+    return results, time.perf_counter() - start
+
+
+def bench_requests(app, path, payloads, concurrency=1) -> Dict:
+    def request(client, payload):
+        start = time.perf_counter()
+        response = client.post(path, json=payload)
+        ok = response.status_code == 200 and "error" not in (response.get_json() or {})
+        return (time.perf_counter() - start) * 1000, ok
+
+    results, elapsed = run_concurrently(app, payloads, concurrency, request)
+    return dict(
+        latency_summary([latency for latency, _ in results]),
+        failures=sum(1 for _, ok in results if not ok),
+        concurrency=concurrency,
+        requests_per_sec=rate(len(results), elapsed),
+    )
+
+
+def bench_chat_stream(app, payloads, concurrency=1) -> Dict:
+    """Streamed chat turns: time to the first token event and to the end of the stream"""
+    def request(client, payload):
+        start = time.perf_counter()
+        first_token_ms = None
+        events = []
+        response = client.post("/api/chat/stream", json=payload, buffered=False)
+        try:
+            for chunk in response.response:
+                text = chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+                if first_token_ms is None and "event: token" in text:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                events.append(text)
+        finally:
+            response.close()
+        ok = "event: done" in "".join(events)
+        return first_token_ms, (time.perf_counter() - start) * 1000, ok
+
+    results, elapsed = run_concurrently(app, payloads, concurrency, request)
+    return {
+        "first_token": latency_summary([first for first, _, _ in results if first is not None]),
+        "total": latency_summary([total for _, total, _ in results]),
+        "failures": sum(1 for _, _, ok in results if not ok),
+        "concurrency": concurrency,
+        "requests_per_sec": rate(len(results), elapsed),
+    }
+
+
+def llm_error_count(ragfuse) -> int:
+    return int(ragfuse.errors.get(stage="llm"))
+
+
+def run(args) -> Dict:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ragfuse-bench-")
+    # Must be set before the app module is imported; it opens its stores at import time
+    os.environ["CHROMA_DATA_DIR"] = os.path.join(workdir, "chroma_data")
+    os.environ["SQLITE_DB_DIR"] = os.path.join(workdir, "sqlite_dbs")
+    os.environ["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    os.environ["MOCK_LLM_TTFT_MS"] = str(args.mock_ttft_ms)
+    os.environ["MOCK_LLM_TOKENS_PER_SEC"] = str(args.mock_tokens_per_sec)
+    os.environ["MOCK_LLM_ERROR_RATE"] = str(args.mock_error_rate)
+    os.environ["MOCK_LLM_SEED"] = str(args.seed)
+
+    corpus = SyntheticCorpus(seed=args.seed, paragraphs=args.paragraphs)
+    files = generate_corpus(os.path.join(workdir, "corpus"), corpus, args.docs_per_type, args.types)
+    queries = corpus.queries([file["document"] for file in files], args.queries)
+
+    sys.path.insert(0, REPO_DIR)
+    import app as ragfuse
+
+    client = ragfuse.app.test_client()
+    result = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "seed": args.seed,
+            "docs_per_type": args.docs_per_type,
+            "types": list(args.types),
+            "paragraphs": args.paragraphs,
+            "queries": args.queries,
+            "n_results": args.n_results,
+            "upload_batch": args.upload_batch,
+            "chat_turns": args.chat_turns,
+            "concurrency": args.concurrency,
+            "llm_provider": args.llm_provider,
+            "mock_llm": {
+                "ttft_ms": args.mock_ttft_ms,
+                "tokens_per_sec": args.mock_tokens_per_sec,
+                "error_rate": args.mock_error_rate,
+            },
+            "retrieval_mode": args.retrieval_mode or ragfuse.app.config["RETRIEVAL_MODE"],
+        },
+    }
+    try:
+        result["extraction"], texts = bench_extraction(ragfuse, files)
+        result["chunking"] = bench_chunking(ragfuse, texts)
+        result["ingestion"] = bench_ingestion(ragfuse, client, files, args.upload_batch)
+
+        search_payloads = [{"query": query, "n_results": args.n_results} for query in queries]
+        if args.retrieval_mode:
+            for payload in search_payloads:
+                payload["retrieval_mode"] = args.retrieval_mode
+        # The second pass repeats the same queries and is served by the retrieval caches
+        result["search"] = {
+            "cold": bench_requests(ragfuse.app, "/api/search", search_payloads, args.concurrency),
+            "warm": bench_requests(ragfuse.app, "/api/search", search_payloads, args.concurrency),
+        }
+        if not args.skip_chat:
+            chat_payloads = [{"message": query, "llm_provider": args.llm_provider} for query in queries[:args.chat_turns]]
+            # Provider failures are answered with an error message, not an HTTP error;
+            # count them from the app's error metric instead
+            llm_errors = llm_error_count(ragfuse)
+            result["chat"] = bench_requests(ragfuse.app, "/api/chat", chat_payloads, args.concurrency)
+            result["chat"]["failures"] += llm_error_count(ragfuse) - llm_errors
+            llm_errors = llm_error_count(ragfuse)
+            result["chat_stream"] = bench_chat_stream(ragfuse.app, chat_payloads, args.concurrency)
+            result["chat_stream"]["failures"] += llm_error_count(ragfuse) - llm_errors
+        result["peak_rss_mb"] = peak_rss_mb()
+    finally:
+        ragfuse.ingestion_queue.executor.shutdown(wait=True)
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline ingest-and-query benchmark for RAGFuse")
+    parser.add_argument("--docs-per-type", type=int, default=5, help="documents generated per file type")
+    parser.add_argument("--types", nargs="+", default=list(SUPPORTED_TYPES), choices=SUPPORTED_TYPES)
+    parser.add_argument("--paragraphs", type=int, default=20, help="paragraphs per document")
+    parser.add_argument("--queries", type=int, default=50, help="search queries per pass")
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--retrieval-mode", choices=["vector", "lexical", "hybrid", "auto"],
+                        help="defaults to the app's RETRIEVAL_MODE")
+    parser.add_argument("--chat-turns", type=int, default=20)
+    parser.add_argument("--llm-provider", default="mock", help="provider sent with chat requests")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent search and chat requests")
+    parser.add_argument("--mock-ttft-ms", type=float, default=0, help="mock provider time to first token")
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=0, help="mock provider speed; 0 for no delay")
+    parser.add_argument("--mock-error-rate", type=float, default=0, help="share of mock provider calls that fail")
+    parser.add_argument("--skip-chat", action="store_true")
+    parser.add_argument("--upload-batch", type=int, default=10, help="files per upload request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep the app data and corpus here instead of a temporary directory")
+    parser.add_argument("--keep", action="store_true", help="don't delete the temporary directory")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
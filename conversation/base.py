@@ -1,6 +1,6 @@
 # conversation_db_interface.py
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 class ConversationStorage(ABC):
     @abstractmethod
@@ -14,13 +14,20 @@ class ConversationStorage(ABC):
         pass
 
     @abstractmethod
-    def get_all_conversations(self) -> List[Dict]:
-        """Get list of all conversations"""
+    def append_messages(self, conversation_id: str, messages: List[Dict], selected_documents: Optional[List] = None):
+        """Append new messages to a conversation, creating it if it doesn't exist"""
         pass
 
     @abstractmethod
-    def get_conversation(self, conversation_id: str) -> List[Dict]:
-        """Get a specific conversation by ID"""
+    def get_all_conversations(self, limit: Optional[int] = None,
+                              after: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        """Get conversations, newest first, optionally one page after (updated_at, id)"""
+        pass
+
+    @abstractmethod
+    def get_conversation(self, conversation_id: str, limit: Optional[int] = None,
+                         before_id: Optional[int] = None) -> List[Dict]:
+        """Get a specific conversation by ID, optionally the latest `limit` messages before `before_id`"""
         pass
 
     @abstractmethod
@@ -1,27 +1,36 @@
 # conversation_sqlite.py
-import sqlite3
 import json
 import os
+import zlib
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from database import SQLiteConnectionPool
 from .base import ConversationStorage
 
+# Titles and previews are stored denormalized on the conversation, trimmed to this length
+SUMMARY_MAX_CHARS = 200
+
 
 class SQLiteConversationStorage(ConversationStorage):
     def __init__(self, db_path="db/conversations.db"):
         self.db_path = db_path
-        self.conn = None
+        self.pool = None
 
     def init(self):
         """Initialize the SQLite database and create tables if not exists"""
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        cursor = self.conn.cursor()
+        self.pool = SQLiteConnectionPool(self.db_path)
+        with self.pool.transaction() as conn:
+            self._create_schema(conn.cursor())
+
+    def _create_schema(self, cursor):
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS conversations (
                 id TEXT PRIMARY KEY,
                 created_at TEXT,
                 updated_at TEXT,
-                selected_documents TEXT DEFAULT '[]'
+                selected_documents TEXT DEFAULT '[]',
+                title TEXT,
+                last_message TEXT
             )
         """)
         cursor.execute("""
@@ -31,68 +40,160 @@ class SQLiteConversationStorage(ConversationStorage):
                 role TEXT,
                 content TEXT,
                 timestamp TEXT,
+                sources TEXT,
+                context_parts BLOB,
                 FOREIGN KEY(conversation_id) REFERENCES conversations(id)
             )
         """)
-        self.conn.commit()
+        # Databases created before sources/context were stored lack these columns
+        cursor.execute("PRAGMA table_info(messages)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if "sources" not in columns:
+            cursor.execute("ALTER TABLE messages ADD COLUMN sources TEXT")
+        if "context_parts" not in columns:
+            cursor.execute("ALTER TABLE messages ADD COLUMN context_parts BLOB")
+
+        cursor.execute("PRAGMA table_info(conversations)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if "title" not in columns:
+            cursor.execute("ALTER TABLE conversations ADD COLUMN title TEXT")
+            cursor.execute("ALTER TABLE conversations ADD COLUMN last_message TEXT")
+            # One-off backfill of the summaries for existing conversations
+            cursor.execute("""
+                UPDATE conversations SET
+                    title = (SELECT substr(content, 1, ?) FROM messages
+                             WHERE conversation_id = conversations.id AND role = 'user'
+                             ORDER BY id ASC LIMIT 1),
+                    last_message = (SELECT substr(content, 1, ?) FROM messages
+                                    WHERE conversation_id = conversations.id
+                                    ORDER BY id DESC LIMIT 1)
+            """, (SUMMARY_MAX_CHARS, SUMMARY_MAX_CHARS))
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at, id)")
+
+    @staticmethod
+    def _summaries(messages: List[Dict]) -> Tuple[Optional[str], Optional[str]]:
+        """Title (first user message) and preview (last message) for a batch of messages"""
+        title = next((msg['content'] for msg in messages if msg['role'] == 'user'), None)
+        last_message = messages[-1]['content'] if messages else None
+        return (
+            title[:SUMMARY_MAX_CHARS] if title else None,
+            last_message[:SUMMARY_MAX_CHARS] if last_message else None,
+        )
+
+    @staticmethod
+    def _message_row(conversation_id: str, msg: Dict, now: str) -> tuple:
+        """Row values for a message; sources as compact JSON, context zlib-compressed"""
+        sources = msg.get('sources')
+        context_parts = msg.get('context_parts')
+        return (
+            conversation_id,
+            msg['role'],
+            msg['content'],
+            msg.get('timestamp', now),
+            json.dumps(sources, separators=(',', ':')) if sources else None,
+            zlib.compress(json.dumps(context_parts, separators=(',', ':')).encode('utf-8'))
+            if context_parts else None,
+        )
+
+    @staticmethod
+    def _message_from_row(row) -> Dict:
+        message = {"id": row[0], "role": row[1], "content": row[2], "timestamp": row[3]}
+        if row[4]:
+            message["sources"] = json.loads(row[4])
+        if row[5]:
+            message["context_parts"] = json.loads(zlib.decompress(row[5]).decode('utf-8'))
+        return message
 
     def save_conversation(self, conversation_id: str, messages: List[Dict], selected_documents: List[Dict] = None):
         """Save or update a conversation and its messages"""
-        if not self.conn:
+        if not self.pool:
             self.init()
             
-        cursor = self.conn.cursor()
         now = datetime.now().isoformat()
         
         # Convert selected_documents to JSON string
         selected_documents_json = json.dumps(selected_documents) if selected_documents is not None else '[]'
 
-        # Upsert conversation
-        cursor.execute("""
-            INSERT OR REPLACE INTO conversations (id, created_at, updated_at, selected_documents)
-            VALUES (?, 
-                COALESCE((SELECT created_at FROM conversations WHERE id = ?), ?),
-                ?,
-                ?
-            )
-        """, (conversation_id, conversation_id, now, now, selected_documents_json))
+        title, last_message = self._summaries(messages)
+
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+            # Upsert conversation
+            cursor.execute("""
+                INSERT INTO conversations (id, created_at, updated_at, selected_documents, title, last_message)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    selected_documents = excluded.selected_documents,
+                    title = excluded.title,
+                    last_message = excluded.last_message
+            """, (conversation_id, now, now, selected_documents_json, title, last_message))
+
+            # Delete old messages for this conversation
+            cursor.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+
+            # Insert new messages
+            cursor.executemany("""
+                INSERT INTO messages (conversation_id, role, content, timestamp, sources, context_parts)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [self._message_row(conversation_id, msg, now) for msg in messages])
 
-        # Delete old messages for this conversation
-        cursor.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+    def append_messages(self, conversation_id: str, messages: List[Dict], selected_documents: Optional[List] = None):
+        """Append new messages to a conversation, creating it if needed, in one transaction.
 
-        # Insert new messages
-        for msg in messages:
+        Existing messages are left untouched. selected_documents replaces the stored
+        selection when given.
+        """
+        if not self.pool:
+            self.init()
+
+        now = datetime.now().isoformat()
+        selected_documents_json = json.dumps(selected_documents) if selected_documents is not None else None
+        title, last_message = self._summaries(messages)
+
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
             cursor.execute("""
-                INSERT INTO messages (conversation_id, role, content, timestamp)
-                VALUES (?, ?, ?, ?)
-            """, (conversation_id, msg['role'], msg['content'], msg.get('timestamp', now)))
+                INSERT INTO conversations (id, created_at, updated_at, selected_documents, title, last_message)
+                VALUES (?, ?, ?, COALESCE(?, '[]'), ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    selected_documents = COALESCE(?, selected_documents),
+                    title = COALESCE(title, excluded.title),
+                    last_message = COALESCE(excluded.last_message, last_message)
+            """, (conversation_id, now, now, selected_documents_json, title, last_message, selected_documents_json))
+            cursor.executemany("""
+                INSERT INTO messages (conversation_id, role, content, timestamp, sources, context_parts)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [self._message_row(conversation_id, msg, now) for msg in messages])
 
-        self.conn.commit()
+    def get_all_conversations(self, limit: Optional[int] = None,
+                              after: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        """Get conversations, most recently updated first, with their titles and previews.
 
-    def get_all_conversations(self) -> List[Dict]:
-        """Get list of all conversations with metadata and descriptive titles/previews"""
-        if not self.conn:
+        Pages with keyset pagination: pass the (updated_at, conversation_id) of the
+        last conversation of the previous page as `after`.
+        """
+        if not self.pool:
             self.init()
 
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT 
-                c.id,
-                c.created_at,
-                c.updated_at,
-                c.selected_documents,
-                (SELECT content FROM messages 
-                 WHERE conversation_id = c.id 
-                 AND role = 'user' 
-                 ORDER BY timestamp ASC LIMIT 1) as title,
-                (SELECT content FROM messages 
-                 WHERE conversation_id = c.id 
-                 ORDER BY timestamp DESC LIMIT 1) as last_message
-            FROM conversations c
-            ORDER BY c.updated_at DESC
-        """)
+        query = """
+            SELECT id, created_at, updated_at, selected_documents, title, last_message
+            FROM conversations
+        """
+        params: list = []
+        if after:
+            query += " WHERE (updated_at, id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY updated_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
 
-        rows = cursor.fetchall()
+        with self.pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
         conversations = []
         for row in rows:
             title = row[4] or f"Chat from {row[1]}"
@@ -100,39 +201,54 @@ class SQLiteConversationStorage(ConversationStorage):
                 "conversation_id": row[0],
                 "created_at": row[1],
                 "updated_at": row[2],
-                "selected_documents": json.loads(row[3]),
+                "selected_documents": json.loads(row[3] or '[]'),
                 "title": title.strip(),
                 "preview": (row[5] or "No messages yet").strip(),
             })
         return conversations
 
-    def get_conversation(self, conversation_id: str) -> List[Dict]:
-        """Get a conversation by ID including its messages"""
-        if not self.conn:
+    def get_conversation(self, conversation_id: str, limit: Optional[int] = None,
+                         before_id: Optional[int] = None) -> List[Dict]:
+        """Get a conversation's messages in order.
+
+        With `limit`, returns only the latest `limit` messages older than message
+        `before_id` (or the latest overall), still oldest first.
+        """
+        if not self.pool:
             self.init()
-            
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT role, content, timestamp FROM messages
-            WHERE conversation_id = ?
-            ORDER BY timestamp ASC
-        """, (conversation_id,))
-        
-        rows = cursor.fetchall()
-        return [{"role": row[0], "content": row[1], "timestamp": row[2]} for row in rows]
+
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            if limit is None and before_id is None:
+                cursor.execute("""
+                    SELECT id, role, content, timestamp, sources, context_parts FROM messages
+                    WHERE conversation_id = ?
+                    ORDER BY id ASC
+                """, (conversation_id,))
+                return [self._message_from_row(row) for row in cursor.fetchall()]
+
+            cursor.execute("""
+                SELECT id, role, content, timestamp, sources, context_parts FROM messages
+                WHERE conversation_id = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (conversation_id, before_id if before_id is not None else 2 ** 63 - 1,
+                  limit if limit is not None else -1))
+            rows = cursor.fetchall()
+        return [self._message_from_row(row) for row in reversed(rows)]
 
     def delete_conversation(self, conversation_id: str):
         """Delete a conversation and its messages"""
-        if not self.conn:
+        if not self.pool:
             self.init()
             
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
-        cursor.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
-        self.conn.commit()
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            cursor.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
 
     def close(self):
         """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
\ No newline at end of file
+        if self.pool:
+            self.pool.close()
+            self.pool = None
\ No newline at end of file
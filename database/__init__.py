@@ -0,0 +1,3 @@
+from .pool import SQLiteConnectionPool
+
+__all__ = ['SQLiteConnectionPool']
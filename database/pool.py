@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+
+class SQLiteConnectionPool:
+    """Hands out SQLite connections to request and worker threads.
+
+    Every connection runs in WAL mode with synchronous=NORMAL and a busy timeout,
+    so readers don't block behind a writer and concurrent writers wait their turn
+    instead of failing with "database is locked". A connection is checked out for
+    the duration of a `connection()` or `transaction()` block and then returned to
+    the idle pool. A thread that already holds one gets the same connection back,
+    so storage methods that call each other share one transaction.
+    """
+
+    def __init__(self, db_path: str, max_idle: int = 8, busy_timeout: float = 5.0):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.busy_timeout = busy_timeout
+        self.lock = threading.Lock()
+        self.idle: List[sqlite3.Connection] = []
+        self.local = threading.local()
+        self.closed = False
+
+    def open_connection(self) -> sqlite3.Connection:
+        """A new connection with the pool's settings, owned (and closed) by the caller"""
+        return self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: no implicit transactions; writes use transaction()
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        with self.lock:
+            if self.closed:
+                raise sqlite3.ProgrammingError(f"Connection pool for {self.db_path} is closed")
+            if self.idle:
+                return self.idle.pop()
+        return self._connect()
+
+    def _checkin(self, conn: sqlite3.Connection):
+        with self.lock:
+            if not self.closed and len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """A connection for this thread, in autocommit mode unless inside transaction()"""
+        held = getattr(self.local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._checkout()
+        self.local.conn = conn
+        try:
+            yield conn
+        finally:
+            self.local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._checkin(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block in one write transaction, committed on success and rolled back on error.
+
+        Nested blocks join the enclosing transaction.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            # IMMEDIATE takes the write lock up front, so the transaction can't
+            # fail halfway through on a lock upgrade
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    @contextmanager
+    def snapshot(self) -> Iterator[sqlite3.Connection]:
+        """Run the block's reads in one deferred transaction: a consistent view, without the write lock.
+
+        Inside a transaction() block this joins it.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN DEFERRED")
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 class DocumentStorage(ABC):
     @abstractmethod
@@ -11,7 +11,24 @@ class DocumentStorage(ABC):
         pass
 
     @abstractmethod
-    def delete_folder(self, folder_id: str):
+    def delete_folder(self, folder_id: str) -> Dict[str, List[str]]:
+        pass
+
+    @abstractmethod
+    def update_folder(self, folder_id: str, name: Optional[str] = None,
+                      parent_id: Optional[str] = None) -> Optional[int]:
+        pass
+
+    @abstractmethod
+    def get_pending_folder_moves(self) -> List[Tuple[str, int]]:
+        pass
+
+    @abstractmethod
+    def finish_folder_move(self, folder_id: str, marker: int):
+        pass
+
+    @abstractmethod
+    def get_folder_path(self, folder_id: str) -> List[str]:
         pass
 
     @abstractmethod
@@ -22,6 +39,14 @@ class DocumentStorage(ABC):
     def delete_file(self, file_id: str):
         pass
 
+    @abstractmethod
+    def save_file_text(self, file_id: str, compressed_text: bytes):
+        pass
+
+    @abstractmethod
+    def get_file_text(self, file_id: str) -> Optional[bytes]:
+        pass
+
     @abstractmethod
     def get_folder(self, folder_id: str) -> Optional[Dict]:
         pass
@@ -34,6 +59,47 @@ class DocumentStorage(ABC):
     def get_file(self, file_id: str) -> Optional[Dict]:
         pass
 
+    @abstractmethod
+    def get_file_by_hash(self, file_hash: str, folder_id: Optional[str] = None) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def clear_all(self):
+        pass
+
+    @abstractmethod
+    def add_chunks(self, file_id: str, chunks: List[Tuple[str, int, str]]):
+        pass
+
+    @abstractmethod
+    def copy_chunks(self, source_file_id: str, file_id: str):
+        pass
+
+    @abstractmethod
+    def delete_chunks(self, file_id: str):
+        pass
+
+    @abstractmethod
+    def get_files_without_chunks(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    def search_chunks(self, query: str, limit: int, file_ids: Optional[List[str]] = None,
+                      folder_id: Optional[str] = None) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    def get_kb_version(self) -> int:
+        pass
+
+    @abstractmethod
+    def bump_kb_version(self):
+        pass
+
+    @abstractmethod
+    def get_tree_version(self) -> int:
+        pass
+
     @abstractmethod
     def get_stats(self) -> Dict:
         pass
@@ -1,17 +1,45 @@
-import sqlite3
+import threading
 import uuid
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
+from database import SQLiteConnectionPool
 from .base import DocumentStorage
+from .tree import FolderTree
+
+# Ids of a folder and every folder below it
+SUBTREE_SQL = """
+    WITH RECURSIVE subtree(id) AS (
+        SELECT id FROM folders WHERE id = ?
+        UNION
+        SELECT folders.id FROM folders JOIN subtree ON folders.parent_id = subtree.id
+    )
+    SELECT id FROM subtree
+"""
+
+# kb_meta key prefix of folder moves whose vector metadata may not be rewritten yet
+PENDING_MOVE_PREFIX = "pending_move:"
 
 class SQLiteDocumentStorage(DocumentStorage):
+    """Documents, folders and the lexical chunk index in SQLite.
+
+    Folder and file listings are served from an in-memory FolderTree. Every
+    change to the tree bumps `tree_version` in the same transaction and is then
+    applied to the cached tree; a version the cache didn't see (another process,
+    or racing writers) makes the next read rebuild it.
+    """
+
     def __init__(self, db_path="db/documents.db"):
         self.db_path = db_path
-        self.conn = None
+        self.pool = None
+        self.tree_lock = threading.Lock()
+        self._tree: Optional[FolderTree] = None
 
     def init(self):
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        c = self.conn.cursor()
+        self.pool = SQLiteConnectionPool(self.db_path)
+        with self.pool.transaction() as conn:
+            self._create_schema(conn.cursor())
+
+    def _create_schema(self, c):
         c.execute("""
             CREATE TABLE IF NOT EXISTS folders (
                 id TEXT PRIMARY KEY,
@@ -35,122 +63,451 @@ class SQLiteDocumentStorage(DocumentStorage):
                 FOREIGN KEY(folder_id) REFERENCES folders(id)
             )
         """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_files_hash ON files(hash)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_files_folder_id ON files(folder_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_folders_parent_id ON folders(parent_id)")
+        # Normalized extracted text, zlib-compressed UTF-8, kept so previews don't re-parse files
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS file_texts (
+                file_id TEXT PRIMARY KEY,
+                content BLOB NOT NULL,
+                FOREIGN KEY(file_id) REFERENCES files(id)
+            )
+        """)
+        # Chunk texts with a BM25-searchable FTS5 index over them. The FTS table uses
+        # `chunks` as external content and is kept in sync by triggers.
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE NOT NULL,
+                file_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                content TEXT NOT NULL
+            )
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_id ON chunks(file_id)")
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                content, content='chunks', content_rowid='id',
+                tokenize="unicode61 tokenchars '-_'"
+            )
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
+            END
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END
+        """)
+        # Knowledge-base version, bumped whenever the indexed file set changes so
+        # caches (in this or any other process) can tell their entries are stale
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS kb_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        c.execute("INSERT OR IGNORE INTO kb_meta (key, value) VALUES ('kb_version', 0)")
+        # Version of the folder/file tree, used to keep the in-memory tree current and as its ETag
+        c.execute("INSERT OR IGNORE INTO kb_meta (key, value) VALUES ('tree_version', 0)")
+        self._create_stats(c)
         # Ensure root folder exists
         c.execute("SELECT id FROM folders WHERE id = 'root'")
         if not c.fetchone():
             c.execute("INSERT INTO folders (id, name, parent_id, created_at) VALUES (?, ?, ?, ?)",
                       ('root', 'Root', None, datetime.now().isoformat()))
-        self.conn.commit()
+
+    def _create_stats(self, c):
+        """Running totals for get_stats, kept current by triggers in the writing transaction.
+
+        Keys are `files`, `folders` (excluding root), `bytes`, `chunks` and
+        `ext:<extension>` per file type. Databases created before the table are
+        counted once when it is added.
+        """
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'kb_stats'")
+        exists = c.fetchone() is not None
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS kb_stats (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS files_stats_ai AFTER INSERT ON files BEGIN
+                UPDATE kb_stats SET value = value + 1 WHERE key = 'files';
+                UPDATE kb_stats SET value = value + coalesce(new.size, 0) WHERE key = 'bytes';
+                UPDATE kb_stats SET value = value + coalesce(new.chunk_count, 0) WHERE key = 'chunks';
+                INSERT OR IGNORE INTO kb_stats (key, value) VALUES ('ext:' || new.extension, 0);
+                UPDATE kb_stats SET value = value + 1 WHERE key = 'ext:' || new.extension;
+            END
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS files_stats_ad AFTER DELETE ON files BEGIN
+                UPDATE kb_stats SET value = value - 1 WHERE key = 'files';
+                UPDATE kb_stats SET value = value - coalesce(old.size, 0) WHERE key = 'bytes';
+                UPDATE kb_stats SET value = value - coalesce(old.chunk_count, 0) WHERE key = 'chunks';
+                UPDATE kb_stats SET value = value - 1 WHERE key = 'ext:' || old.extension;
+                DELETE FROM kb_stats WHERE key = 'ext:' || old.extension AND value <= 0;
+            END
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS folders_stats_ai AFTER INSERT ON folders WHEN new.id != 'root' BEGIN
+                UPDATE kb_stats SET value = value + 1 WHERE key = 'folders';
+            END
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS folders_stats_ad AFTER DELETE ON folders WHEN old.id != 'root' BEGIN
+                UPDATE kb_stats SET value = value - 1 WHERE key = 'folders';
+            END
+        """)
+        if exists:
+            return
+        c.execute("""
+            INSERT INTO kb_stats (key, value)
+            SELECT 'files', COUNT(*) FROM files
+            UNION ALL SELECT 'bytes', coalesce(SUM(size), 0) FROM files
+            UNION ALL SELECT 'chunks', coalesce(SUM(chunk_count), 0) FROM files
+            UNION ALL SELECT 'folders', COUNT(*) FROM folders WHERE id != 'root'
+        """)
+        c.execute("""
+            INSERT INTO kb_stats (key, value)
+            SELECT 'ext:' || extension, COUNT(*) FROM files GROUP BY extension
+        """)
 
     def add_folder(self, name: str, parent_id: str) -> str:
         folder_id = str(uuid.uuid4())
         now = datetime.now().isoformat()
-        c = self.conn.cursor()
-        c.execute("INSERT INTO folders (id, name, parent_id, created_at) VALUES (?, ?, ?, ?)",
-                  (folder_id, name, parent_id, now))
-        self.conn.commit()
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("INSERT INTO folders (id, name, parent_id, created_at) VALUES (?, ?, ?, ?)",
+                      (folder_id, name, parent_id, now))
+            version = self._bump_tree_version(c)
+        self._update_tree(version, lambda tree: tree.add_folder(folder_id, name, parent_id, now))
         return folder_id
 
-    def delete_folder(self, folder_id: str):
-        c = self.conn.cursor()
-        # Delete files in this folder
-        c.execute("SELECT id FROM files WHERE folder_id = ?", (folder_id,))
-        file_ids = [row[0] for row in c.fetchall()]
-        for file_id in file_ids:
-            self.delete_file(file_id)
-        # Delete subfolders recursively
-        c.execute("SELECT id FROM folders WHERE parent_id = ?", (folder_id,))
-        subfolder_ids = [row[0] for row in c.fetchall()]
-        for sub_id in subfolder_ids:
-            self.delete_folder(sub_id)
-        # Delete this folder
-        c.execute("DELETE FROM folders WHERE id = ?", (folder_id,))
-        self.conn.commit()
+    def delete_folder(self, folder_id: str) -> Dict[str, List[str]]:
+        """Delete a folder with all its subfolders and files in one transaction.
+
+        Returns the ids of the removed folders and files, so callers can clean up
+        vectors and upload directories that live outside this database.
+        """
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS deleted_folders (id TEXT PRIMARY KEY)")
+            c.execute("DELETE FROM temp.deleted_folders")
+            c.execute(f"INSERT INTO temp.deleted_folders {SUBTREE_SQL}", (folder_id,))
+            c.execute("SELECT id FROM temp.deleted_folders")
+            folder_ids = [row[0] for row in c.fetchall()]
+            c.execute("SELECT id FROM files WHERE folder_id IN (SELECT id FROM temp.deleted_folders)")
+            file_ids = [row[0] for row in c.fetchall()]
+
+            subtree_files = "SELECT id FROM files WHERE folder_id IN (SELECT id FROM temp.deleted_folders)"
+            c.execute(f"DELETE FROM file_texts WHERE file_id IN ({subtree_files})")
+            c.execute(f"DELETE FROM chunks WHERE file_id IN ({subtree_files})")
+            c.execute("DELETE FROM files WHERE folder_id IN (SELECT id FROM temp.deleted_folders)")
+            c.execute("DELETE FROM folders WHERE id IN (SELECT id FROM temp.deleted_folders)")
+            c.execute("DELETE FROM kb_meta WHERE key IN (SELECT ? || id FROM temp.deleted_folders)",
+                      (PENDING_MOVE_PREFIX,))
+            c.execute("DELETE FROM temp.deleted_folders")
+            if file_ids:
+                self._bump_kb_version(c)
+            version = self._bump_tree_version(c)
+        self._update_tree(version, lambda tree: tree.remove_folders(folder_ids))
+        return {"folder_ids": folder_ids, "file_ids": file_ids}
+
+    def update_folder(self, folder_id: str, name: Optional[str] = None,
+                      parent_id: Optional[str] = None) -> Optional[int]:
+        """Rename a folder and/or move it under `parent_id`, in one transaction.
+
+        Raises ValueError if the parent is missing or inside the folder. A move is
+        also recorded as pending until finish_folder_move is called with the
+        returned marker (None if the folder wasn't moved), so data derived from
+        the folder's path (vector metadata) can be brought up to date again if
+        that is interrupted.
+        """
+        marker = None
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            if parent_id is not None:
+                c.execute("SELECT 1 FROM folders WHERE id = ?", (parent_id,))
+                if not c.fetchone():
+                    raise ValueError("Parent folder not found")
+                c.execute(f"SELECT 1 FROM ({SUBTREE_SQL}) WHERE id = ?", (folder_id, parent_id))
+                if c.fetchone():
+                    raise ValueError("Cannot move a folder into itself")
+                c.execute("UPDATE folders SET parent_id = ? WHERE id = ?", (parent_id, folder_id))
+                # Folder-filtered search results change with the tree
+                self._bump_kb_version(c)
+            if name is not None:
+                c.execute("UPDATE folders SET name = ? WHERE id = ?", (name, folder_id))
+            version = self._bump_tree_version(c)
+            if parent_id is not None:
+                marker = version
+                c.execute("INSERT OR REPLACE INTO kb_meta (key, value) VALUES (?, ?)",
+                          (PENDING_MOVE_PREFIX + folder_id, marker))
+
+        def change(tree: FolderTree):
+            if parent_id is not None:
+                tree.move_folder(folder_id, parent_id)
+            if name is not None:
+                tree.rename_folder(folder_id, name)
+
+        self._update_tree(version, change)
+        return marker
+
+    def get_pending_folder_moves(self) -> List[Tuple[str, int]]:
+        """(folder_id, marker) of moves whose finish_folder_move never ran"""
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT key, value FROM kb_meta WHERE key LIKE ?", (PENDING_MOVE_PREFIX + "%",))
+            return [(key[len(PENDING_MOVE_PREFIX):], value) for key, value in c.fetchall()]
+
+    def finish_folder_move(self, folder_id: str, marker: int):
+        """Clear a pending move, unless the folder has been moved again since, and bump kb_version"""
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM kb_meta WHERE key = ? AND value = ?", (PENDING_MOVE_PREFIX + folder_id, marker))
+            self._bump_kb_version(c)
+
+    def get_folder_path(self, folder_id: str) -> List[str]:
+        """Ids of the folders from root down to `folder_id`, inclusive; empty if it doesn't exist"""
+        return [folder["id"] for folder in self._get_tree().breadcrumb(folder_id)]
 
     def add_file(self, file_info: Dict):
-        c = self.conn.cursor()
-        c.execute("""
-            INSERT INTO files (id, name, extension, size, hash, folder_id, chunk_count, created_at, text_length)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("""
+                INSERT INTO files (id, name, extension, size, hash, folder_id, chunk_count, created_at, text_length)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                file_info["id"], file_info["name"], file_info["extension"], file_info["size"],
+                file_info["hash"], file_info["folder_id"], file_info["chunk_count"],
+                file_info["created_at"], file_info["text_length"]
+            ))
+            self._bump_kb_version(c)
+            version = self._bump_tree_version(c)
+        self._update_tree(version, lambda tree: tree.add_file(
             file_info["id"], file_info["name"], file_info["extension"], file_info["size"],
-            file_info["hash"], file_info["folder_id"], file_info["chunk_count"],
-            file_info["created_at"], file_info["text_length"]
-        ))
-        self.conn.commit()
+            file_info["folder_id"], file_info["created_at"], file_info["chunk_count"]))
 
     def delete_file(self, file_id: str):
-        c = self.conn.cursor()
-        c.execute("DELETE FROM files WHERE id = ?", (file_id,))
-        self.conn.commit()
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM file_texts WHERE file_id = ?", (file_id,))
+            c.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+            c.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            self._bump_kb_version(c)
+            version = self._bump_tree_version(c)
+        self._update_tree(version, lambda tree: tree.remove_file(file_id))
+
+    def clear_all(self):
+        """Delete every file, its text and lexical index, and all folders except root"""
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM file_texts")
+            c.execute("DELETE FROM chunks")
+            c.execute("DELETE FROM files")
+            c.execute("DELETE FROM folders WHERE id != 'root'")
+            c.execute("DELETE FROM kb_meta WHERE key LIKE ?", (PENDING_MOVE_PREFIX + "%",))
+            self._bump_kb_version(c)
+            version = self._bump_tree_version(c)
+        self._update_tree(version, lambda tree: tree.clear())
+
+    def add_chunks(self, file_id: str, chunks: List[Tuple[str, int, str]]):
+        """Add (chunk_id, chunk_index, text) rows for a file to the lexical index"""
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.executemany("INSERT OR REPLACE INTO chunks (chunk_id, file_id, chunk_index, content) VALUES (?, ?, ?, ?)",
+                          [(chunk_id, file_id, chunk_index, text) for chunk_id, chunk_index, text in chunks])
+
+    def copy_chunks(self, source_file_id: str, file_id: str):
+        """Index another file's chunks under `file_id`, with ids following the `<file_id>_chunk_<n>` scheme"""
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("""
+                INSERT OR REPLACE INTO chunks (chunk_id, file_id, chunk_index, content)
+                SELECT ? || '_chunk_' || chunk_index, ?, chunk_index, content
+                FROM chunks WHERE file_id = ?
+            """, (file_id, file_id, source_file_id))
+
+    def delete_chunks(self, file_id: str):
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+
+    def get_files_without_chunks(self) -> List[str]:
+        """Ids of indexed files that have no rows in the lexical index (e.g. uploaded before it existed)"""
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id FROM files WHERE NOT EXISTS (SELECT 1 FROM chunks WHERE chunks.file_id = files.id)")
+            return [row[0] for row in c.fetchall()]
+
+    def search_chunks(self, query: str, limit: int, file_ids: Optional[List[str]] = None,
+                      folder_id: Optional[str] = None) -> List[Dict]:
+        """BM25 search over chunk texts. Results are ordered best first; lower scores are better."""
+        terms = [term.replace('"', '""') for term in query.split()]
+        if not terms:
+            return []
+        match_query = " OR ".join(f'"{term}"' for term in terms)
+
+        sql = """
+            SELECT ch.chunk_id, ch.file_id, ch.chunk_index, ch.content,
+                   f.name, f.folder_id, f.extension, f.created_at, bm25(chunks_fts) AS score
+            FROM chunks_fts
+            JOIN chunks ch ON ch.id = chunks_fts.rowid
+            JOIN files f ON f.id = ch.file_id
+            WHERE chunks_fts MATCH ?
+        """
+        params: list = [match_query]
+        if file_ids:
+            sql += f" AND ch.file_id IN ({','.join('?' * len(file_ids))})"
+            params.extend(file_ids)
+        elif folder_id:
+            # The folder and all of its subfolders
+            sql += f" AND f.folder_id IN ({SUBTREE_SQL})"
+            params.append(folder_id)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute(sql, params)
+            return [
+                {
+                    "chunk_id": r[0], "file_id": r[1], "chunk_index": r[2], "content": r[3],
+                    "filename": r[4], "folder_id": r[5], "file_extension": r[6], "upload_date": r[7],
+                    "score": r[8],
+                }
+                for r in c.fetchall()
+            ]
+
+    def get_kb_version(self) -> int:
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT value FROM kb_meta WHERE key = 'kb_version'")
+            return c.fetchone()[0]
+
+    def bump_kb_version(self):
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            self._bump_kb_version(c)
+
+    def _bump_kb_version(self, c):
+        c.execute("UPDATE kb_meta SET value = value + 1 WHERE key = 'kb_version'")
+
+    def get_tree_version(self) -> int:
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT value FROM kb_meta WHERE key = 'tree_version'")
+            return c.fetchone()[0]
+
+    def _bump_tree_version(self, c) -> int:
+        c.execute("UPDATE kb_meta SET value = value + 1 WHERE key = 'tree_version'")
+        c.execute("SELECT value FROM kb_meta WHERE key = 'tree_version'")
+        return c.fetchone()[0]
+
+    def _update_tree(self, version: int, change: Callable[[FolderTree], None]):
+        """Apply a committed tree change to the cached tree, or drop it if it fell behind"""
+        with self.tree_lock:
+            if self._tree is not None and not self._tree.apply(version, change):
+                self._tree = None
+
+    def _get_tree(self) -> FolderTree:
+        """The cached tree, rebuilt from the database if it's missing or stale"""
+        version = self.get_tree_version()
+        with self.tree_lock:
+            if self._tree is not None and self._tree.version == version:
+                return self._tree
+            # One read transaction so the version matches the rows read; it takes no
+            # write lock, so a rebuild doesn't hold up writers
+            with self.pool.snapshot() as conn:
+                c = conn.cursor()
+                c.execute("SELECT value FROM kb_meta WHERE key = 'tree_version'")
+                version = c.fetchone()[0]
+                c.execute("SELECT id, name, parent_id, created_at FROM folders")
+                folders = c.fetchall()
+                c.execute("SELECT id, name, extension, size, folder_id, created_at, chunk_count FROM files")
+                files = c.fetchall()
+            self._tree = FolderTree(folders, files, version)
+            return self._tree
+
+    def save_file_text(self, file_id: str, compressed_text: bytes):
+        """Store a file's extracted text, already zlib-compressed"""
+        with self.pool.transaction() as conn:
+            c = conn.cursor()
+            c.execute("INSERT OR REPLACE INTO file_texts (file_id, content) VALUES (?, ?)",
+                      (file_id, compressed_text))
+
+    def get_file_text(self, file_id: str) -> Optional[bytes]:
+        """Get a file's zlib-compressed extracted text, if stored"""
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT content FROM file_texts WHERE file_id = ?", (file_id,))
+            row = c.fetchone()
+            return row[0] if row else None
 
     def get_folder(self, folder_id: str) -> Optional[Dict]:
-        c = self.conn.cursor()
-        c.execute("SELECT id, name, parent_id, created_at FROM folders WHERE id = ?", (folder_id,))
-        row = c.fetchone()
-        if row:
-            return {"id": row[0], "name": row[1], "parent": row[2], "created_at": row[3]}
-        return None
+        return self._get_tree().get_folder(folder_id)
 
     def get_folder_children(self, folder_id: str) -> (List[Dict], List[Dict]):
-        c = self.conn.cursor()
-        c.execute("SELECT id, name, created_at FROM folders WHERE parent_id = ?", (folder_id,))
-        folders = [{"id": r[0], "name": r[1], "type": "folder", "created_at": r[2]} for r in c.fetchall()]
-        c.execute("SELECT id, name, extension, size, created_at, chunk_count FROM files WHERE folder_id = ?", (folder_id,))
-        files = [{"id": r[0], "name": r[1], "type": "file", "extension": r[2], "size": r[3], "created_at": r[4], "chunk_count": r[5]} for r in c.fetchall()]
-        return folders, files
+        return self._get_tree().children(folder_id)
 
     def get_file(self, file_id: str) -> Optional[Dict]:
-        c = self.conn.cursor()
-        c.execute("SELECT * FROM files WHERE id = ?", (file_id,))
-        row = c.fetchone()
-        if row:
-            return {
-                "id": row[0], "name": row[1], "extension": row[2], "size": row[3],
-                "hash": row[4], "folder_id": row[5], "chunk_count": row[6],
-                "created_at": row[7], "text_length": row[8]
-            }
-        return None
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT * FROM files WHERE id = ?", (file_id,))
+            row = c.fetchone()
+            if row:
+                return {
+                    "id": row[0], "name": row[1], "extension": row[2], "size": row[3],
+                    "hash": row[4], "folder_id": row[5], "chunk_count": row[6],
+                    "created_at": row[7], "text_length": row[8]
+                }
+            return None
+
+    def get_file_by_hash(self, file_hash: str, folder_id: Optional[str] = None) -> Optional[Dict]:
+        """Find an already indexed file with the same content hash, preferring one in `folder_id`"""
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT * FROM files WHERE hash = ?
+                ORDER BY CASE WHEN folder_id = ? THEN 0 ELSE 1 END, created_at
+                LIMIT 1
+            """, (file_hash, folder_id))
+            row = c.fetchone()
+            if row:
+                return {
+                    "id": row[0], "name": row[1], "extension": row[2], "size": row[3],
+                    "hash": row[4], "folder_id": row[5], "chunk_count": row[6],
+                    "created_at": row[7], "text_length": row[8]
+                }
+            return None
 
     def get_stats(self) -> Dict:
-        c = self.conn.cursor()
-        c.execute("SELECT COUNT(*) FROM files")
-        total_files = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM folders WHERE id != 'root'")
-        total_folders = c.fetchone()[0]
-        c.execute("SELECT extension, COUNT(*) FROM files GROUP BY extension")
-        file_types = {row[0]: row[1] for row in c.fetchall()}
-        c.execute("SELECT SUM(size) FROM files")
-        total_size = c.fetchone()[0] or 0
+        """Totals from the kb_stats table; no scan of files or folders"""
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT key, value FROM kb_stats")
+            totals = dict(c.fetchall())
         return {
-            "total_files": total_files,
-            "total_folders": total_folders,
-            "file_types": file_types,
-            "total_size_bytes": total_size
+            "total_files": totals.get("files", 0),
+            "total_folders": totals.get("folders", 0),
+            "total_chunks": totals.get("chunks", 0),
+            "file_types": {key[4:]: value for key, value in totals.items() if key.startswith("ext:")},
+            "total_size_bytes": totals.get("bytes", 0),
         }
 
     def build_breadcrumb(self, folder_id: str) -> List[Dict]:
-        breadcrumb = []
-        current_id = folder_id
-        while current_id:
-            f = self.get_folder(current_id)
-            if not f:
-                break
-            breadcrumb.insert(0, {"id": f["id"], "name": f["name"]})
-            current_id = f["parent"]
-        return breadcrumb
+        return self._get_tree().breadcrumb(folder_id)
 
     def get_all_folders_and_files(self) -> Dict[str, List[Dict]]:
-        c = self.conn.cursor()
-        c.execute("SELECT id, name, parent_id FROM folders")
-        folders = [{"id": r[0], "name": r[1], "parent_id": r[2], "type": "folder"} for r in c.fetchall()]
-
-        c.execute("SELECT id, name, extension, size, folder_id FROM files")
-        files = [{"id": r[0], "name": r[1], "extension": r[2], "size": r[3], "folder_id": r[4], "type": "file"} for r in c.fetchall()]
-
-        return {"folders": folders, "files": files}
+        return self._get_tree().listing()
 
     def close(self):
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+        self._tree = None
@@ -0,0 +1,127 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+FOLDER_FIELDS = ("id", "name", "parent_id", "created_at")
+FILE_FIELDS = ("id", "name", "extension", "size", "folder_id", "created_at", "chunk_count")
+
+
+class FolderTree:
+    """In-memory index of the folder and file tree.
+
+    Built once from the database, then kept current by applying each committed
+    change to it. `version` is the database's tree version the index reflects;
+    a change is only applied on top of the version it followed, otherwise the
+    index is stale and the owner rebuilds it.
+    """
+
+    def __init__(self, folders: Iterable[Tuple], files: Iterable[Tuple], version: int):
+        self.lock = threading.RLock()
+        self.version = version
+        self.folders: Dict[str, Dict] = {}
+        self.files: Dict[str, Dict] = {}
+        # Children in insertion order; dicts double as ordered sets
+        self.child_folders: Dict[str, Dict[str, None]] = {}
+        self.child_files: Dict[str, Dict[str, None]] = {}
+        self._listing: Optional[Dict[str, List[Dict]]] = None
+        for row in folders:
+            self.add_folder(*row)
+        for row in files:
+            self.add_file(*row)
+
+    def apply(self, version: int, change: Callable[["FolderTree"], None]) -> bool:
+        """Apply a change committed as `version`; False if the index missed one before it"""
+        with self.lock:
+            if version != self.version + 1:
+                return False
+            change(self)
+            self.version = version
+            self._listing = None
+            return True
+
+    def add_folder(self, folder_id: str, name: str, parent_id: Optional[str], created_at: str):
+        self.folders[folder_id] = dict(zip(FOLDER_FIELDS, (folder_id, name, parent_id, created_at)))
+        self.child_folders.setdefault(parent_id, {})[folder_id] = None
+
+    def rename_folder(self, folder_id: str, name: str):
+        self.folders[folder_id]["name"] = name
+
+    def move_folder(self, folder_id: str, parent_id: str):
+        folder = self.folders[folder_id]
+        self.child_folders.get(folder["parent_id"], {}).pop(folder_id, None)
+        folder["parent_id"] = parent_id
+        self.child_folders.setdefault(parent_id, {})[folder_id] = None
+
+    def remove_folders(self, folder_ids: Iterable[str]):
+        """Remove folders and the files directly in them"""
+        for folder_id in folder_ids:
+            folder = self.folders.pop(folder_id, None)
+            if folder:
+                self.child_folders.get(folder["parent_id"], {}).pop(folder_id, None)
+            self.child_folders.pop(folder_id, None)
+            for file_id in self.child_files.pop(folder_id, {}):
+                self.files.pop(file_id, None)
+
+    def add_file(self, file_id: str, name: str, extension: str, size: int, folder_id: str,
+                 created_at: str, chunk_count: int):
+        self.files[file_id] = dict(zip(FILE_FIELDS, (file_id, name, extension, size, folder_id, created_at, chunk_count)))
+        self.child_files.setdefault(folder_id, {})[file_id] = None
+
+    def remove_file(self, file_id: str):
+        file = self.files.pop(file_id, None)
+        if file:
+            self.child_files.get(file["folder_id"], {}).pop(file_id, None)
+
+    def clear(self):
+        """Remove every file and every folder except root"""
+        root = self.folders.get("root")
+        self.folders, self.files = {}, {}
+        self.child_folders, self.child_files = {}, {}
+        if root:
+            self.add_folder(root["id"], root["name"], None, root["created_at"])
+
+    def get_folder(self, folder_id: str) -> Optional[Dict]:
+        with self.lock:
+            folder = self.folders.get(folder_id)
+            if not folder:
+                return None
+            return {"id": folder["id"], "name": folder["name"], "parent": folder["parent_id"],
+                    "created_at": folder["created_at"]}
+
+    def children(self, folder_id: str) -> Tuple[List[Dict], List[Dict]]:
+        with self.lock:
+            folders = [
+                {"id": f["id"], "name": f["name"], "type": "folder", "created_at": f["created_at"]}
+                for f in (self.folders[i] for i in self.child_folders.get(folder_id, {}))
+            ]
+            files = [
+                {"id": f["id"], "name": f["name"], "type": "file", "extension": f["extension"],
+                 "size": f["size"], "created_at": f["created_at"], "chunk_count": f["chunk_count"]}
+                for f in (self.files[i] for i in self.child_files.get(folder_id, {}))
+            ]
+            return folders, files
+
+    def breadcrumb(self, folder_id: str) -> List[Dict]:
+        with self.lock:
+            breadcrumb = []
+            folder = self.folders.get(folder_id)
+            while folder and len(breadcrumb) <= len(self.folders):
+                breadcrumb.insert(0, {"id": folder["id"], "name": folder["name"]})
+                folder = self.folders.get(folder["parent_id"])
+            return breadcrumb
+
+    def listing(self) -> Dict[str, List[Dict]]:
+        """Every folder and file; built once per version and shared, so treat it as read-only"""
+        with self.lock:
+            if self._listing is None:
+                self._listing = {
+                    "folders": [
+                        {"id": f["id"], "name": f["name"], "parent_id": f["parent_id"], "type": "folder"}
+                        for f in self.folders.values()
+                    ],
+                    "files": [
+                        {"id": f["id"], "name": f["name"], "extension": f["extension"], "size": f["size"],
+                         "folder_id": f["folder_id"], "type": "file"}
+                        for f in self.files.values()
+                    ],
+                }
+            return self._listing
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """Persistent cache of chunk embeddings keyed by a hash of the chunk text.
+
+    Vectors live in a memory-mapped float32 matrix (`vectors.f32`, one row per slot);
+    a small SQLite index maps text hash -> slot and tracks last use. When all
+    `max_entries` slots are taken, the least recently used entries are evicted and
+    their slots reused, so the cache never grows beyond max_entries * dim floats.
+
+    The index records the embedding `model` the vectors came from; opening the
+    cache with a different model discards them. Several processes may share the
+    directory: writers hold an exclusive SQLite lock while they allocate slots and
+    write vectors, and readers copy vectors out under a shared one, so a slot is
+    never handed out twice or read while it is being overwritten.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 100_000, model: str = ""):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.model = model
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.lock = threading.Lock()
+        self.vectors = None
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: transactions are explicit so their locking mode is ours to pick.
+        # The default rollback journal is relied on: EXCLUSIVE there also keeps readers out.
+        self.conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False,
+                                    isolation_level=None, timeout=30)
+        with self._transaction("EXCLUSIVE") as c:
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key BLOB PRIMARY KEY,
+                    slot INTEGER NOT NULL UNIQUE,
+                    last_used REAL NOT NULL
+                )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+            if self._get_meta(c, "model") != model:
+                # Vectors from another model (or a cache predating this check) are wrong, not just stale
+                self._reset(c)
+            elif not self._sync_vectors(c):
+                # Index without a matching vector file (or a resized cache) is useless; start over
+                self._reset(c)
+            elif self._get_meta(c, "next_slot") is None:
+                c.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM entries")
+                self._set_meta(c, "next_slot", c.fetchone()[0])
+
+    @staticmethod
+    def make_key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return the cached vector for each text, or None where it is not cached"""
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        if not texts:
+            return results
+
+        with self.lock:
+            keys = [self.make_key(text) for text in texts]
+            # Deferred: holds a shared lock from the first read, which keeps writers
+            # from reusing a slot until its vector has been copied out
+            with self._transaction("DEFERRED") as c:
+                if not self._sync_vectors(c):
+                    self.misses += len(texts)
+                    return results
+                slots = self._lookup_slots(c, keys)
+                for i, key in enumerate(keys):
+                    slot = slots.get(key)
+                    if slot is not None:
+                        results[i] = self.vectors[slot].tolist()
+
+            if slots:
+                now = time.time()
+                with self._transaction("IMMEDIATE") as c:
+                    c.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in slots])
+
+            found = sum(1 for r in results if r is not None)
+            self.hits += found
+            self.misses += len(texts) - found
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store vectors for texts, evicting least recently used entries when full"""
+        if not texts:
+            return
+
+        with self.lock, self._transaction("EXCLUSIVE") as c:
+            array = np.asarray(vectors, dtype=np.float32)
+            if not self._sync_vectors(c):
+                self._create_vectors(c, array.shape[1])
+            if array.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {array.shape[1]} does not match cache dimension {self.dim}")
+
+            now = time.time()
+            pending = {}
+            for text, vector in zip(texts, array):
+                pending[self.make_key(text)] = vector
+
+            existing = self._lookup_slots(c, list(pending))
+            # Refresh entries being overwritten so eviction below cannot pick them
+            c.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in existing])
+
+            new_keys = [key for key in pending if key not in existing]
+            free_slots = self._allocate_slots(c, len(new_keys))
+            for key, slot in zip(new_keys, free_slots):
+                existing[key] = slot
+
+            for key, slot in existing.items():
+                self.vectors[slot] = pending[key]
+            self.vectors.flush()
+
+            c.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for key, slot in existing.items()],
+            )
+
+    def stats(self):
+        with self.lock:
+            c = self.conn.cursor()
+            c.execute("SELECT COUNT(*) FROM entries")
+            return {
+                "entries": c.fetchone()[0],
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        with self.lock:
+            if self.vectors is not None:
+                self.vectors.flush()
+                self.vectors = None
+            self.conn.close()
+
+    @contextmanager
+    def _transaction(self, mode: str):
+        c = self.conn.cursor()
+        c.execute(f"BEGIN {mode}")
+        try:
+            yield c
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        else:
+            self.conn.execute("COMMIT")
+
+    @staticmethod
+    def _get_meta(c, key: str) -> Optional[str]:
+        c.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        row = c.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(c, key: str, value):
+        c.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _reset(self, c):
+        c.execute("DELETE FROM entries")
+        c.execute("DELETE FROM meta WHERE key = 'dim'")
+        self._set_meta(c, "model", self.model)
+        self._set_meta(c, "next_slot", 0)
+        self.vectors = None
+        self.dim = None
+
+    def _sync_vectors(self, c) -> bool:
+        """Open the vector file another process (or a previous run) created; False if there is none"""
+        dim = self._get_meta(c, "dim")
+        if dim is None:
+            self.vectors = None
+            self.dim = None
+            return False
+        if self.vectors is None or self.dim != int(dim):
+            if not os.path.exists(self.vectors_path) \
+                    or os.path.getsize(self.vectors_path) != self.max_entries * int(dim) * 4:
+                return False
+            self._open_vectors(int(dim), mode="r+")
+        return True
+
+    def _lookup_slots(self, c, keys):
+        slots = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            c.execute(f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch)
+            slots.update(c.fetchall())
+        return slots
+
+    def _allocate_slots(self, c, count: int) -> List[int]:
+        """Hand out `count` unused slots, evicting the least recently used entries if needed.
+
+        Must run in the writer's transaction: the stored `next_slot` counter is what
+        keeps two processes from handing out the same slot.
+        """
+        if count == 0:
+            return []
+        count = min(count, self.max_entries)
+        # Slots are handed out in order until the matrix is full; after that only
+        # evicted slots are reused
+        next_slot = int(self._get_meta(c, "next_slot") or 0)
+        free = list(range(next_slot, min(next_slot + count, self.max_entries)))
+        self._set_meta(c, "next_slot", next_slot + len(free))
+        if len(free) == count:
+            return free
+
+        c.execute("SELECT key, slot FROM entries ORDER BY last_used ASC LIMIT ?", (count - len(free),))
+        evicted = c.fetchall()
+        c.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+        return free + [slot for _, slot in evicted]
+
+    def _create_vectors(self, c, dim: int):
+        # The file is created sparse, so unused slots take no disk space
+        with open(self.vectors_path, "wb") as f:
+            f.truncate(self.max_entries * dim * 4)
+        c.execute("DELETE FROM entries")
+        self._set_meta(c, "dim", dim)
+        self._set_meta(c, "next_slot", 0)
+        self._open_vectors(dim, mode="r+")
+
+    def _open_vectors(self, dim: int, mode: str):
+        self.dim = dim
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode=mode, shape=(self.max_entries, dim))
@@ -0,0 +1,19 @@
+from .extractors import (
+    iter_document_segments,
+    iter_docx_segments,
+    iter_pdf_pages,
+    iter_pptx_segments,
+    iter_txt_segments,
+    normalize_whitespace,
+    shutdown_pdf_pool,
+)
+
+__all__ = [
+    'iter_document_segments',
+    'iter_docx_segments',
+    'iter_pdf_pages',
+    'iter_pptx_segments',
+    'iter_txt_segments',
+    'normalize_whitespace',
+    'shutdown_pdf_pool',
+]
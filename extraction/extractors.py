@@ -0,0 +1,261 @@
+import codecs
+import logging
+import multiprocessing
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional
+
+import PyPDF2
+import docx
+from pptx import Presentation
+
+logger = logging.getLogger(__name__)
+
+TEXT_ENCODINGS = ["utf-8", "latin-1", "cp1252", "iso-8859-1"]
+TEXT_BLOCK_SIZE = 64 * 1024
+PDF_PAGES_PER_TASK = 16
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of whitespace into single spaces"""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _extract_pdf_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop) of a PDF, skipping pages that fail to extract"""
+    texts = []
+    with open(file_path, "rb") as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages[start:stop]:
+            try:
+                page_text = page.extract_text()
+            except Exception as e:
+                logger.warning(f"Error extracting text from PDF page: {e}")
+                continue
+            if page_text:
+                texts.append(page_text)
+    return texts
+
+
+_pdf_pool = None
+_pdf_pool_workers = 0
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    global _pdf_pool, _pdf_pool_workers
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool_workers != workers:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown(wait=False)
+            # Spawned, not forked: forking copies the app's threads' locks in whatever state they are in
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pdf_pool_workers = workers
+        return _pdf_pool
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next large PDF gets a fresh one"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False)
+
+
+def shutdown_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=True)
+            _pdf_pool = None
+
+
+def _iter_pdf_pages_parallel(file_path: str, page_count: int, workers: int) -> Iterator[str]:
+    """Extract page ranges in worker processes and yield pages in document order.
+
+    At most two ranges per worker are in flight, so finished pages never pile up
+    faster than the consumer takes them. If the pool breaks (a worker died), the
+    ranges it lost and all remaining ones are extracted in this process instead.
+    """
+    pool = _get_pdf_pool(workers)
+    ranges = deque(
+        (start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    )
+    in_flight = deque()
+
+    def pool_broken(e: Exception):
+        nonlocal pool
+        if pool is not None:
+            logger.warning(f"PDF extraction pool is broken, extracting the rest of {file_path} inline: {e}")
+            _discard_pdf_pool(pool)
+            pool = None
+
+    def submit_next():
+        start, stop = ranges.popleft()
+        future = None
+        if pool is not None:
+            try:
+                future = pool.submit(_extract_pdf_page_range, file_path, start, stop)
+            except (BrokenProcessPool, RuntimeError) as e:
+                # RuntimeError: another thread already shut this pool down after it broke
+                pool_broken(e)
+        in_flight.append((start, stop, future))
+
+    while ranges and len(in_flight) < 2 * workers:
+        submit_next()
+
+    while in_flight:
+        start, stop, future = in_flight.popleft()
+        if ranges:
+            submit_next()
+        if future is None:
+            texts = _extract_pdf_page_range(file_path, start, stop)
+        else:
+            try:
+                texts = future.result()
+            except BrokenProcessPool as e:
+                pool_broken(e)
+                texts = _extract_pdf_page_range(file_path, start, stop)
+            except Exception as e:
+                # A failed range shouldn't be lost; redo it in this process
+                logger.warning(f"Parallel PDF extraction of pages {start}-{stop} failed, retrying inline: {e}")
+                texts = _extract_pdf_page_range(file_path, start, stop)
+        yield from texts
+
+
+def iter_pdf_pages(file_path: str, workers: int = 1, parallel_min_pages: int = 50) -> Iterator[str]:
+    """Yield the raw text of each PDF page, skipping pages that fail to extract.
+
+    PDFs with at least `parallel_min_pages` pages are split into page ranges and
+    extracted across `workers` processes when workers > 1.
+    """
+    try:
+        with open(file_path, "rb") as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            page_count = len(pdf_reader.pages)
+            if workers <= 1 or page_count < parallel_min_pages:
+                for page in pdf_reader.pages:
+                    try:
+                        page_text = page.extract_text()
+                    except Exception as e:
+                        logger.warning(f"Error extracting text from PDF page: {e}")
+                        continue
+                    if page_text:
+                        yield page_text
+                return
+
+        yield from _iter_pdf_pages_parallel(file_path, page_count, workers)
+    except Exception as e:
+        logger.error(f"PDF extraction error for {file_path}: {e}")
+
+
+def iter_docx_segments(file_path: str) -> Iterator[str]:
+    """Yield DOCX paragraphs, then one segment per table row"""
+    try:
+        doc = docx.Document(file_path)
+        for paragraph in doc.paragraphs:
+            if paragraph.text.strip():
+                yield paragraph.text
+
+        # Extract from tables
+        for table in doc.tables:
+            for row in table.rows:
+                cells = [cell.text for cell in row.cells if cell.text.strip()]
+                if cells:
+                    yield " ".join(cells)
+    except Exception as e:
+        logger.error(f"DOCX extraction error: {e}")
+
+
+def iter_pptx_segments(file_path: str) -> Iterator[str]:
+    """Yield the text of each PPTX slide"""
+    try:
+        prs = Presentation(file_path)
+        for slide in prs.slides:
+            texts = [
+                shape.text for shape in slide.shapes
+                if hasattr(shape, "text") and shape.text.strip()
+            ]
+            if texts:
+                yield "\n".join(texts)
+    except Exception as e:
+        logger.error(f"PPTX extraction error: {e}")
+
+
+def _detect_encoding(file_path: str) -> Optional[str]:
+    """Return the first encoding in TEXT_ENCODINGS that decodes the whole file"""
+    for encoding in TEXT_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(file_path, "rb") as file:
+                for block in iter(lambda: file.read(TEXT_BLOCK_SIZE), b""):
+                    decoder.decode(block)
+                decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+        except Exception as e:
+            logger.error(f"Text extraction error: {e}")
+            return None
+    return None
+
+
+def iter_txt_segments(file_path: str) -> Iterator[str]:
+    """Yield a text file in blocks, split on whitespace so no word straddles two blocks"""
+    encoding = _detect_encoding(file_path)
+    if not encoding:
+        return
+    try:
+        with open(file_path, "r", encoding=encoding) as file:
+            carry = ""
+            for block in iter(lambda: file.read(TEXT_BLOCK_SIZE), ""):
+                block = carry + block
+                match = None
+                for match in _WHITESPACE.finditer(block):
+                    pass
+                if match is None:
+                    # No whitespace at all; don't let a pathological block grow without bound
+                    if len(block) >= 4 * TEXT_BLOCK_SIZE:
+                        yield block
+                        block = ""
+                    carry = block
+                    continue
+                carry = block[match.end():]
+                yield block[:match.start()]
+            if carry:
+                yield carry
+    except Exception as e:
+        logger.error(f"Text extraction error: {e}")
+
+
+def iter_document_segments(file_path: str, filename: str, pdf_workers: int = 1,
+                           pdf_parallel_min_pages: int = 50) -> Iterator[str]:
+    """Yield whitespace-normalized, non-empty text segments of a document.
+
+    Joining the segments with single spaces gives the document's full cleaned text,
+    but callers can consume them one at a time without holding the whole document.
+    """
+    file_extension = filename.rsplit(".", 1)[1].lower()
+
+    if file_extension == "pdf":
+        segments = iter_pdf_pages(file_path, workers=pdf_workers, parallel_min_pages=pdf_parallel_min_pages)
+    elif file_extension == "docx":
+        segments = iter_docx_segments(file_path)
+    elif file_extension == "pptx":
+        segments = iter_pptx_segments(file_path)
+    elif file_extension in ["txt", "md", "csv", "json"]:
+        segments = iter_txt_segments(file_path)
+    else:
+        return
+
+    for segment in segments:
+        segment = normalize_whitespace(segment)
+        if segment:
+            yield segment
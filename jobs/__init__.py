@@ -0,0 +1,3 @@
+from .queue import IngestionError, IngestionJob, IngestionJobQueue
+
+__all__ = ['IngestionError', 'IngestionJob', 'IngestionJobQueue']
@@ -0,0 +1,139 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STAGES = ("completed", "failed")
+
+
+class IngestionError(Exception):
+    """Raised by an ingestion handler when a file cannot be indexed.
+
+    The message is reported to the client as the file's error.
+    """
+    pass
+
+
+class IngestionJob:
+    def __init__(self, folder_id: str, files: List[Tuple[str, str]]):
+        self.id = str(uuid.uuid4())
+        self.folder_id = folder_id
+        now = datetime.now().isoformat()
+        self.created_at = now
+        self.updated_at = now
+        self.version = 0
+        self.files = [
+            {"filename": filename, "path": path, "stage": "queued", "chunk_count": 0,
+             "deduplicated": False, "error": None}
+            for filename, path in files
+        ]
+
+    @property
+    def status(self) -> str:
+        stages = [f["stage"] for f in self.files]
+        if all(stage in FINISHED_STAGES for stage in stages):
+            return "failed" if all(stage == "failed" for stage in stages) else "completed"
+        if all(stage == "queued" for stage in stages):
+            return "queued"
+        return "running"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STAGES
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "folder_id": self.folder_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "total_chunks": sum(f["chunk_count"] for f in self.files),
+            "deduplicated": [f["filename"] for f in self.files if f["deduplicated"]],
+            "files": [
+                {k: v for k, v in f.items() if k != "path"}
+                for f in self.files
+            ],
+        }
+
+
+class IngestionJobQueue:
+    """Runs uploaded files through the ingestion pipeline on a background thread pool.
+
+    `handler(file_path, filename, folder_id, report)` does the actual work and returns
+    a dict that is merged into the file's status (e.g. ``{"chunk_count": 12}``). It may
+    call ``report(stage=..., **fields)`` to publish progress while it runs.
+    """
+
+    def __init__(self, handler: Callable, max_workers: int = 2, max_finished_jobs: int = 500):
+        self.handler = handler
+        self.max_finished_jobs = max_finished_jobs
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self.condition = threading.Condition()
+
+    def submit(self, folder_id: str, files: List[Tuple[str, str]]) -> IngestionJob:
+        """Queue a job for a list of (filename, saved_path) pairs"""
+        job = IngestionJob(folder_id, files)
+        with self.condition:
+            self.jobs[job.id] = job
+            self._evict_finished()
+        for index in range(len(job.files)):
+            self.executor.submit(self._run, job, index)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def wait_for_update(self, job_id: str, last_version: int, timeout: float = 15.0) -> Tuple[Optional[Dict], int]:
+        """Block until the job changes past `last_version` or `timeout` elapses.
+
+        Returns the job snapshot (None if unknown) and its current version.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: job_id not in self.jobs or self.jobs[job_id].version > last_version,
+                timeout=timeout,
+            )
+            job = self.jobs.get(job_id)
+            if not job:
+                return None, last_version
+            return job.to_dict(), job.version
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+    def _update(self, job: IngestionJob, index: int, **fields):
+        with self.condition:
+            job.files[index].update(fields)
+            job.updated_at = datetime.now().isoformat()
+            job.version += 1
+            self.condition.notify_all()
+
+    def _run(self, job: IngestionJob, index: int):
+        entry = job.files[index]
+
+        def report(**fields):
+            self._update(job, index, **fields)
+
+        try:
+            result = self.handler(entry["path"], entry["filename"], job.folder_id, report) or {}
+            self._update(job, index, stage="completed", **result)
+        except IngestionError as e:
+            logger.warning(f"Ingestion of {entry['filename']} failed: {e}")
+            self._update(job, index, stage="failed", error=str(e))
+        except Exception as e:
+            logger.error(f"Error processing {entry['filename']}: {e}")
+            self._update(job, index, stage="failed", error="Processing failed")
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
@@ -1,7 +1,51 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
+
+
+class LLMError(Exception):
+    """Raised by a provider when generation fails; the message is fit to show the user"""
+    pass
+
 
 class LLM(ABC):
+    """A chat model provider.
+
+    `prompt` is the complete user turn and already contains the retrieved context;
+    `context` lists the parts included in it, for reference only, and must not be
+    sent again. `history` holds earlier turns of the conversation, oldest first,
+    as {"role": "user" | "bot", "content": ...} dicts.
+    """
+
+    SYSTEM_PROMPT = "You are a helpful assistant. Use the context provided with the user's question to answer it."
+
     @abstractmethod
-    def generate_response(self, prompt: str, context: List[str]) -> str:
+    def generate_response(self, prompt: str, context: List[str], history: Optional[List[Dict]] = None) -> str:
         pass
+
+    def stream_response(self, prompt: str, context: List[str],
+                        history: Optional[List[Dict]] = None) -> Iterator[str]:
+        """Yield the response in pieces as it is generated.
+
+        Providers without native streaming yield the complete response once.
+        """
+        yield self.generate_response(prompt, context, history)
+
+    @staticmethod
+    def history_messages(history: Optional[List[Dict]], assistant_role: str = "assistant") -> List[Dict]:
+        """Earlier turns as chat messages, starting from the first user message"""
+        messages = []
+        for message in history or []:
+            if not messages and message["role"] != "user":
+                continue
+            role = "user" if message["role"] == "user" else assistant_role
+            messages.append({"role": role, "content": message["content"]})
+        return messages
+
+    @staticmethod
+    def history_transcript(history: Optional[List[Dict]]) -> str:
+        """Earlier turns as plain text, for completion-style APIs"""
+        lines = []
+        for message in history or []:
+            speaker = "User" if message["role"] == "user" else "Assistant"
+            lines.append(f"{speaker}: {message['content']}")
+        return "\n\n".join(lines)
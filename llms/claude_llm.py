@@ -1,5 +1,5 @@
-from llms.base import LLM
-from typing import List
+from llms.base import LLM, LLMError
+from typing import Dict, Iterator, List, Optional
 import os
 import anthropic
 
@@ -8,20 +8,32 @@ class ClaudeLLM(LLM):
         self.client = anthropic.Anthropic(api_key=api_key)
         self.model = model
 
-    def generate_response(self, prompt: str, context: List[str]) -> str:
-        system_message = "You are a helpful assistant. Use the following context to answer the user's question."
-        if context:
-            system_message += "\n\nContext:\n" + "\n".join(context)
+    def _build_messages(self, prompt: str, history: Optional[List[Dict]] = None) -> List[dict]:
+        # The retrieved context is already part of the prompt
+        return self.history_messages(history) + [{"role": "user", "content": prompt}]
 
+    def generate_response(self, prompt: str, context: List[str], history: Optional[List[Dict]] = None) -> str:
         try:
             message = self.client.messages.create(
                 model=self.model,
                 max_tokens=1024,
-                system=system_message,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+                system=self.SYSTEM_PROMPT,
+                messages=self._build_messages(prompt, history)
             )
             return message.content[0].text
         except Exception as e:
-            return f"Error from Claude: {e}"
+            raise LLMError(f"Error from Claude: {e}") from e
+
+    def stream_response(self, prompt: str, context: List[str],
+                        history: Optional[List[Dict]] = None) -> Iterator[str]:
+        try:
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=1024,
+                system=self.SYSTEM_PROMPT,
+                messages=self._build_messages(prompt, history)
+            ) as stream:
+                for text in stream.text_stream:
+                    yield text
+        except Exception as e:
+            raise LLMError(f"Error from Claude: {e}") from e
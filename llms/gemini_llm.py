@@ -1,5 +1,5 @@
-from llms.base import LLM
-from typing import List
+from llms.base import LLM, LLMError
+from typing import Dict, Iterator, List, Optional
 import os
 import google.generativeai as genai
 
@@ -7,18 +7,31 @@ class GeminiLLM(LLM):
     def __init__(self, api_key: str, model: str = "gemini-pro"):
         genai.configure(api_key=api_key)
         self.model = model
+        self.client = genai.GenerativeModel(model)
 
-    def generate_response(self, prompt: str, context: List[str]) -> str:
-        model = genai.GenerativeModel(self.model)
-        
-        full_prompt = "You are a helpful assistant. Use the following context to answer the user's question.\n\n"
-        if context:
-            full_prompt += "Context:\n" + "\n".join(context) + "\n\n"
-        full_prompt += "Question: " + prompt
+    def _build_contents(self, prompt: str, history: Optional[List[Dict]] = None) -> List[dict]:
+        # The retrieved context is already part of the prompt
+        contents = [
+            {"role": message["role"], "parts": [message["content"]]}
+            for message in self.history_messages(history, assistant_role="model")
+        ]
+        contents.append({"role": "user", "parts": [self.SYSTEM_PROMPT + "\n\n" + prompt]})
+        return contents
 
+    def generate_response(self, prompt: str, context: List[str], history: Optional[List[Dict]] = None) -> str:
         try:
-            response = model.generate_content(full_prompt)
+            response = self.client.generate_content(self._build_contents(prompt, history))
             return response.text
         except Exception as e:
-            return f"Error from Gemini: {e}"
+            raise LLMError(f"Error from Gemini: {e}") from e
+
+    def stream_response(self, prompt: str, context: List[str],
+                        history: Optional[List[Dict]] = None) -> Iterator[str]:
+        try:
+            response = self.client.generate_content(self._build_contents(prompt, history), stream=True)
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise LLMError(f"Error from Gemini: {e}") from e
 
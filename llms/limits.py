@@ -0,0 +1,44 @@
+from typing import Optional
+
+# Context window sizes in tokens, matched by model name prefix (longest prefix wins)
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16_385,
+    "gpt-4": 8_192,
+    "gpt-4-turbo": 128_000,
+    "gpt-4o": 128_000,
+    "gpt-4.1": 1_000_000,
+    "o1": 128_000,
+    "o3": 200_000,
+    "claude": 200_000,
+    "gemini-pro": 32_760,
+    "gemini-1.0": 32_760,
+    "gemini-1.5": 1_000_000,
+    "gemini-2": 1_000_000,
+    "llama2": 4_096,
+    "llama3": 8_192,
+    "mistral": 32_768,
+}
+
+# Upper bounds per provider, whatever the model supports. Ollama only allocates
+# 2048 tokens of context (num_ctx) unless the model is configured otherwise, and
+# silently cuts longer prompts, so no Ollama model gets more than that
+PROVIDER_CONTEXT_WINDOWS = {
+    "ollama": 2_048,
+}
+# Used when the model is unknown
+DEFAULT_CONTEXT_WINDOW = 8_192
+
+# Tokens each message costs beyond its content: chat APIs' role framing, or the
+# "User: " / "Assistant: " labels and separators of a completion-style transcript
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def context_window(provider: str, model: Optional[str]) -> int:
+    """Best-known context window, in tokens, of a provider's model"""
+    window = DEFAULT_CONTEXT_WINDOW
+    if model:
+        name = model.lower()
+        matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if name.startswith(prefix)]
+        if matches:
+            window = MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+    return min(window, PROVIDER_CONTEXT_WINDOWS.get(provider, window))
@@ -0,0 +1,65 @@
+from llms.base import LLM, LLMError
+from typing import Dict, Iterator, List, Optional
+import hashlib
+import random
+import re
+import threading
+import time
+
+
+class MockLLMError(LLMError):
+    """A simulated provider failure"""
+
+
+class MockLLM(LLM):
+    """Offline provider with deterministic output, for load testing /api/chat.
+
+    The response is derived from the prompt alone, so the same prompt always gets
+    the same answer. Timing imitates a hosted model: the first piece arrives
+    after `ttft_ms`, the rest at `tokens_per_sec` (0 for no delay), in pieces of
+    `chunk_tokens` tokens. `error_rate` of the calls fail before the first token;
+    which ones is drawn from a generator seeded with `seed`, so a run's failures
+    repeat across runs.
+    """
+
+    def __init__(self, ttft_ms: float = 200.0, tokens_per_sec: float = 50.0, response_tokens: int = 64,
+                 chunk_tokens: int = 1, error_rate: float = 0.0, seed: int = 0):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.response_tokens = response_tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+
+    def _tokens(self, prompt: str) -> List[str]:
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        words = re.findall(r"\w+", prompt) or ["mock"]
+        tokens = ["Mock", " response:"]
+        while len(tokens) < self.response_tokens:
+            tokens.append(" " + rng.choice(words))
+        return tokens[:self.response_tokens]
+
+    def _fails(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def generate_response(self, prompt: str, context: List[str], history: Optional[List[Dict]] = None) -> str:
+        return "".join(self.stream_response(prompt, context, history))
+
+    def stream_response(self, prompt: str, context: List[str],
+                        history: Optional[List[Dict]] = None) -> Iterator[str]:
+        start = time.perf_counter()
+        first_token_at = start + self.ttft_ms / 1000
+        if self._fails():
+            time.sleep(max(0.0, first_token_at - time.perf_counter()))
+            raise MockLLMError("Simulated provider error")
+
+        tokens = self._tokens(prompt)
+        for i in range(0, len(tokens), self.chunk_tokens):
+            # Pace against the start time so sleep overhead doesn't accumulate
+            due = first_token_at + (i / self.tokens_per_sec if self.tokens_per_sec > 0 else 0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield "".join(tokens[i:i + self.chunk_tokens])
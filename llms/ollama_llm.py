@@ -1,5 +1,5 @@
-from llms.base import LLM
-from typing import List
+from llms.base import LLM, LLMError
+from typing import Dict, Iterator, List, Optional
 import requests
 import json
 
@@ -7,25 +7,54 @@ class OllamaLLM(LLM):
     def __init__(self, endpoint: str = "http://localhost:11434", model: str = "llama2"):
         self.endpoint = endpoint
         self.model = model
+        # Reuse connections to the Ollama server across requests
+        self.session = requests.Session()
 
-    def generate_response(self, prompt: str, context: List[str]) -> str:
-        full_prompt = "You are a helpful assistant. Use the following context to answer the user's question.\n\n"
-        if context:
-            full_prompt += "Context:\n" + "\n".join(context) + "\n\n"
-        full_prompt += "Question: " + prompt
+    def _build_prompt(self, prompt: str, history: Optional[List[Dict]] = None) -> str:
+        # The retrieved context is already part of the prompt
+        full_prompt = self.SYSTEM_PROMPT + "\n\n"
+        if history:
+            full_prompt += self.history_transcript(history) + "\n\n"
+        full_prompt += "User: " + prompt + "\n\nAssistant:"
+        return full_prompt
 
+    def generate_response(self, prompt: str, context: List[str], history: Optional[List[Dict]] = None) -> str:
         try:
-            response = requests.post(f"{self.endpoint}/api/generate", json={
+            response = self.session.post(f"{self.endpoint}/api/generate", json={
                 "model": self.model,
-                "prompt": full_prompt,
+                "prompt": self._build_prompt(prompt, history),
                 "stream": False
             })
             response.raise_for_status()
             return response.json()["response"]
         except requests.exceptions.RequestException as e:
-            return f"Error connecting to Ollama: {e}"
-        except json.JSONDecodeError:
-            return "Error: Invalid JSON response from Ollama"
+            raise LLMError(f"Error connecting to Ollama: {e}") from e
+        except json.JSONDecodeError as e:
+            raise LLMError("Error: Invalid JSON response from Ollama") from e
         except Exception as e:
-            return f"Error from Ollama: {e}"
+            raise LLMError(f"Error from Ollama: {e}") from e
 
+    def stream_response(self, prompt: str, context: List[str],
+                        history: Optional[List[Dict]] = None) -> Iterator[str]:
+        try:
+            with self.session.post(f"{self.endpoint}/api/generate", json={
+                "model": self.model,
+                "prompt": self._build_prompt(prompt, history),
+                "stream": True
+            }, stream=True) as response:
+                response.raise_for_status()
+                # Ollama streams one JSON object per line
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        break
+        except requests.exceptions.RequestException as e:
+            raise LLMError(f"Error connecting to Ollama: {e}") from e
+        except json.JSONDecodeError as e:
+            raise LLMError("Error: Invalid JSON response from Ollama") from e
+        except Exception as e:
+            raise LLMError(f"Error from Ollama: {e}") from e
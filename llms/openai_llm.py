@@ -1,5 +1,5 @@
-from llms.base import LLM
-from typing import List
+from llms.base import LLM, LLMError
+from typing import Dict, Iterator, List, Optional
 import os
 from openai import OpenAI
 
@@ -8,19 +8,35 @@ class OpenAILLM(LLM):
         self.client = OpenAI(api_key=api_key)
         self.model = model
 
-    def generate_response(self, prompt: str, context: List[str]) -> str:
+    def _build_messages(self, prompt: str, context: List[str], history: Optional[List[Dict]] = None) -> List[dict]:
         messages = []
         if context:
-            messages.append({"role": "system", "content": "You are a helpful assistant. Use the following context to answer the user's question."})
-            for chunk in context:
-                messages.append({"role": "system", "content": chunk})
+            # The context itself is already part of the prompt
+            messages.append({"role": "system", "content": self.SYSTEM_PROMPT})
+        messages.extend(self.history_messages(history))
         messages.append({"role": "user", "content": prompt})
+        return messages
 
+    def generate_response(self, prompt: str, context: List[str], history: Optional[List[Dict]] = None) -> str:
         try:
             chat_completion = self.client.chat.completions.create(
-                messages=messages,
+                messages=self._build_messages(prompt, context, history),
                 model=self.model,
             )
             return chat_completion.choices[0].message.content
         except Exception as e:
-            return f"Error from OpenAI: {e}"
+            raise LLMError(f"Error from OpenAI: {e}") from e
+
+    def stream_response(self, prompt: str, context: List[str],
+                        history: Optional[List[Dict]] = None) -> Iterator[str]:
+        try:
+            stream = self.client.chat.completions.create(
+                messages=self._build_messages(prompt, context, history),
+                model=self.model,
+                stream=True,
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise LLMError(f"Error from OpenAI: {e}") from e
@@ -0,0 +1,41 @@
+import threading
+from typing import Callable, Dict, Hashable, Tuple
+
+from llms.base import LLM
+
+
+class LLMRegistry:
+    """Keeps one live LLM client per provider and reuses it across requests.
+
+    Each entry remembers the configuration it was built from (model, credentials,
+    endpoint). A request with the same configuration gets the cached instance and
+    its warm HTTP connection pool; a changed configuration rebuilds only that
+    provider's client.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.instances: Dict[str, Tuple[Hashable, LLM]] = {}
+
+    def get(self, provider: str, config: Hashable, factory: Callable[[], LLM]) -> LLM:
+        with self.lock:
+            cached = self.instances.get(provider)
+            if cached and cached[0] == config:
+                return cached[1]
+
+        # Build outside the lock; client construction can be slow
+        instance = factory()
+        with self.lock:
+            cached = self.instances.get(provider)
+            if cached and cached[0] == config:
+                return cached[1]
+            self.instances[provider] = (config, instance)
+            return instance
+
+    def invalidate(self, provider: str = None):
+        """Drop the cached client for a provider, or for all providers"""
+        with self.lock:
+            if provider is None:
+                self.instances.clear()
+            else:
+                self.instances.pop(provider, None)
@@ -0,0 +1,3 @@
+from .registry import CallbackMetric, Counter, Histogram, MetricsRegistry
+
+__all__ = ['CallbackMetric', 'Counter', 'Histogram', 'MetricsRegistry']
@@ -0,0 +1,179 @@
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond cache lookups up to multi-minute PDF extraction
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abstractmethod
+    def samples(self) -> List[Sample]:
+        pass
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination. Name it `<name>_total`."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """Current count for one label combination, 0 if it was never incremented"""
+        key = self._key(labels)
+        with self.lock:
+            return self.values.get(key, 0)
+
+    def samples(self) -> List[Sample]:
+        with self.lock:
+            return [(self.name, self._labels(key), value) for key, value in self.values.items()]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets, per label combination"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label key: [count per bucket (+Inf last), sum]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the seconds spent in the block, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Sample]:
+        with self.lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self.values.items()]
+        samples = []
+        for key, counts, total in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", dict(labels, le=_format_value(bound)), cumulative))
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, cumulative))
+        return samples
+
+
+class CallbackMetric(_Metric):
+    """A metric whose values are read from elsewhere when scraped, e.g. a cache's hit count.
+
+    `collect` returns a mapping of label-value tuples (in `labelnames` order) to values.
+    """
+
+    def __init__(self, name: str, documentation: str, metric_type: str,
+                 collect: Callable[[], Dict[Tuple[str, ...], float]], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.type = metric_type
+        self.collect = collect
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, self._labels(key), value) for key, value in self.collect().items()]
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format.
+
+    Recording is a dict update under a per-metric lock, so instrumentation is
+    cheap enough to leave on; all formatting happens at scrape time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+    def callback(self, name: str, documentation: str, metric_type: str,
+                 collect: Callable[[], Dict[Tuple[str, ...], float]], labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, metric_type, collect, labelnames))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            documentation = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {metric.name} {documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,7 @@
+from .cache import TTLCache, normalize_query
+from .fusion import is_keyword_query, reciprocal_rank_fusion
+from .packing import estimate_tokens, merge_hits, pack_context, truncate_to_tokens, window_history
+from .rerank import CrossEncoderReranker
+
+__all__ = ['TTLCache', 'normalize_query', 'is_keyword_query', 'reciprocal_rank_fusion', 'CrossEncoderReranker',
+           'estimate_tokens', 'merge_hits', 'pack_context', 'truncate_to_tokens', 'window_history']
@@ -0,0 +1,23 @@
+from typing import Dict, List, Sequence
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Fuse several best-first rankings of ids with reciprocal rank fusion.
+
+    Each id scores sum(1 / (k + rank)) over the rankings it appears in; ids are
+    returned best first. `k` dampens the advantage of the very top ranks.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item_id: scores[item_id], reverse=True)
+
+
+def is_keyword_query(query: str, max_terms: int = 3) -> bool:
+    """Whether a query looks like a few bare keywords (codes, names) rather than a question"""
+    terms = query.split()
+    if not terms or len(terms) > max_terms or query.rstrip().endswith("?"):
+        return False
+    question_words = {"what", "why", "how", "when", "where", "who", "which", "explain", "describe"}
+    return terms[0].lower() not in question_words
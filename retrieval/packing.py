@@ -0,0 +1,127 @@
+import re
+from typing import Dict, List
+
+# No tokenizer is shipped for every provider; about four characters per token is
+# close enough for English text to keep prompts inside their budget
+CHARS_PER_TOKEN = 4
+# A truncated part shorter than this is more noise than context; leave it out
+MIN_TRUNCATED_TOKENS = 64
+# Longest overlap looked for when joining neighbouring chunks
+MAX_OVERLAP_CHARS = 2000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a word boundary where possible"""
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return text[:cut].rstrip() + " ..."
+
+
+def _canonical(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _join_overlapping(left: str, right: str) -> str:
+    """Join two neighbouring chunks, dropping text the start of `right` repeats from `left`"""
+    tail = left[-MAX_OVERLAP_CHARS:]
+    probe = right[:32]
+    if len(probe) == 32:
+        start = tail.find(probe)
+        while start != -1:
+            if right.startswith(tail[start:]):
+                return left + right[len(tail) - start:]
+            start = tail.find(probe, start + 1)
+    return left + " " + right
+
+
+def merge_hits(hits: List[Dict]) -> List[Dict]:
+    """Deduplicate retrieved chunks and merge consecutive chunks of the same file.
+
+    `hits` are dicts with `content` and, for document chunks, `file_id` and
+    `chunk_index`, in rank order. A chunk whose text repeats (or is contained in)
+    a better-ranked one is dropped, e.g. the same chunk found in two copies of a
+    deduplicated file. Runs of adjacent `chunk_index` values from one file become
+    a single block. Blocks come back in the rank order of their best chunk, as
+    dicts with `content`, `file_id`, `filename` and `chunk_indexes`.
+    """
+    kept = []
+    seen = []
+    for rank, hit in enumerate(hits):
+        canonical = _canonical(hit["content"])
+        if not canonical or any(canonical in other for other in seen):
+            continue
+        seen.append(canonical)
+        kept.append((rank, hit))
+
+    blocks = []
+    by_file: Dict[str, List] = {}
+    for rank, hit in kept:
+        if hit.get("file_id") is None or hit.get("chunk_index") is None:
+            blocks.append({"rank": rank, "content": hit["content"], "file_id": None,
+                           "filename": hit.get("filename"), "chunk_indexes": []})
+        else:
+            by_file.setdefault(hit["file_id"], []).append((rank, hit))
+
+    for file_id, members in by_file.items():
+        members.sort(key=lambda member: member[1]["chunk_index"])
+        block = None
+        for rank, hit in members:
+            if block and hit["chunk_index"] == block["chunk_indexes"][-1] + 1:
+                block["content"] = _join_overlapping(block["content"], hit["content"])
+                block["chunk_indexes"].append(hit["chunk_index"])
+                block["rank"] = min(block["rank"], rank)
+                continue
+            block = {"rank": rank, "content": hit["content"], "file_id": file_id,
+                     "filename": hit.get("filename"), "chunk_indexes": [hit["chunk_index"]]}
+            blocks.append(block)
+
+    blocks.sort(key=lambda block: block["rank"])
+    for block in blocks:
+        del block["rank"]
+    return blocks
+
+
+def pack_context(parts: List[str], budget_tokens: int) -> List[str]:
+    """Keep context parts, in order, until the token budget runs out.
+
+    The part that crosses the budget is truncated to fit, if enough of it remains
+    to be useful; everything after it is dropped.
+    """
+    packed = []
+    remaining = budget_tokens
+    for part in parts:
+        tokens = estimate_tokens(part)
+        if tokens <= remaining:
+            packed.append(part)
+            remaining -= tokens
+            continue
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            packed.append(truncate_to_tokens(part, remaining))
+        break
+    return packed
+
+
+def window_history(messages: List[Dict], budget_tokens: int, overhead_tokens: int = 0) -> List[Dict]:
+    """The most recent messages that fit in the token budget, oldest first.
+
+    Each message is charged `overhead_tokens` on top of its content, for role framing.
+    """
+    window = []
+    remaining = budget_tokens
+    for message in reversed(messages):
+        tokens = estimate_tokens(message["content"]) + overhead_tokens
+        if tokens > remaining:
+            break
+        window.append(message)
+        remaining -= tokens
+    window.reverse()
+    return window
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """Scores (query, passage) pairs with a small cross-encoder on CPU.
+
+    The model is loaded lazily on first use through `transformers` (pulled in by
+    chonkie's neural extra); if it cannot be loaded the reranker disables itself
+    and callers keep the retrieval order. Scoring runs in batches against a
+    latency budget, which includes time spent waiting for another request's
+    reranking: once the next batch would overrun it, reranking is abandoned and
+    the original order is kept.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 batch_size: int = 16, max_length: int = 512):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.lock = threading.Lock()
+        self.tokenizer = None
+        self.model = None
+        self.available = True
+        # Moving average of seconds per batch, used to predict whether the next one fits
+        self.batch_seconds: Optional[float] = None
+
+    def _load(self) -> bool:
+        if self.model is not None or not self.available:
+            return self.available
+        try:
+            import torch
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            self.model.to(torch.device("cpu"))
+            self.model.eval()
+        except Exception as e:
+            logger.error(f"Reranker model {self.model_name} unavailable, keeping retrieval order: {e}")
+            self.available = False
+        return self.available
+
+    def _score_batch(self, query: str, passages: Sequence[str]) -> List[float]:
+        import torch
+
+        features = self.tokenizer(
+            [query] * len(passages),
+            list(passages),
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt",
+        )
+        with torch.inference_mode():
+            logits = self.model(**features).logits
+        # Single-logit relevance heads are the norm for ms-marco style models
+        return logits[:, -1].tolist()
+
+    def rerank(self, query: str, passages: Sequence[str],
+               budget_ms: float) -> Tuple[Optional[List[int]], Dict]:
+        """Return passage indices ordered by relevance and a timing report.
+
+        The order is None when reranking was skipped, failed or ran out of budget.
+        """
+        start = time.perf_counter()
+        report = {"candidates": len(passages), "reranked": False, "elapsed_ms": 0.0}
+
+        def finish(order, reason=None):
+            report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            if reason:
+                report["skipped"] = reason
+            return order, report
+
+        if len(passages) < 2:
+            return finish(None, "too_few_candidates")
+
+        # Waiting behind other requests' reranking counts against the budget too
+        budget = budget_ms / 1000
+        if not self.lock.acquire(timeout=max(0.0, budget)):
+            return finish(None, "busy")
+        try:
+            loaded = self.model is not None
+            load_began = time.perf_counter()
+            if not self._load():
+                return finish(None, "model_unavailable")
+            if not loaded:
+                # Loading the model is a one-off cost; don't charge it to this request's budget
+                start += time.perf_counter() - load_began
+
+            scores: List[float] = []
+            for batch_start in range(0, len(passages), self.batch_size):
+                elapsed = time.perf_counter() - start
+                if self.batch_seconds is not None and elapsed + self.batch_seconds > budget:
+                    # Let the estimate drift down so one slow batch doesn't disable reranking for good
+                    self.batch_seconds *= 0.9
+                    return finish(None, "latency_budget")
+
+                batch_began = time.perf_counter()
+                try:
+                    scores.extend(self._score_batch(query, passages[batch_start:batch_start + self.batch_size]))
+                except Exception as e:
+                    logger.error(f"Reranking failed, keeping retrieval order: {e}")
+                    return finish(None, "error")
+                batch_took = time.perf_counter() - batch_began
+                self.batch_seconds = batch_took if self.batch_seconds is None \
+                    else 0.8 * self.batch_seconds + 0.2 * batch_took
+        finally:
+            self.lock.release()
+
+        report["reranked"] = True
+        order = sorted(range(len(passages)), key=lambda i: scores[i], reverse=True)
+        return finish(order)
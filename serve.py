@@ -0,0 +1,12 @@
+# serve.py
+"""Development server entry point.
+
+app.py is imported here instead of being run as the main script: worker
+processes started with "spawn" (PDF extraction) re-run the main script, and
+this one does nothing unless it is actually __main__.
+"""
+
+if __name__ == "__main__":
+    from app import app
+
+    app.run(host="0.0.0.0", port=5000, debug=True)
@@ -1,46 +1,82 @@
-import sqlite3
 import json
+import threading
+import time
 from typing import Dict, Optional
+from database import SQLiteConnectionPool
 
 class LLMSettingsStorage:
-    def __init__(self, db_path="db/llm_settings.db"):
+    """LLM settings stored in SQLite and served from an in-memory snapshot.
+
+    The snapshot is reloaded only when the database changes. Writes through this
+    instance update it directly; writes from other processes are detected with
+    `PRAGMA data_version`, checked at most once every `refresh_interval` seconds.
+    data_version is only comparable on one connection, so a dedicated connection,
+    used under the lock, does the checking.
+    """
+
+    def __init__(self, db_path="db/llm_settings.db", refresh_interval: float = 1.0):
         self.db_path = db_path
-        self.conn = None
+        self.pool = None
+        self.monitor = None
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self._settings: Optional[Dict[str, str]] = None
+        self._data_version = None
+        self._checked_at = 0.0
 
     def init(self):
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        c = self.conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS llm_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        """)
-        self.conn.commit()
+        self.pool = SQLiteConnectionPool(self.db_path, max_idle=2)
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+        self.monitor = self.pool.open_connection()
+        self._settings = None
 
     def save_setting(self, key: str, value: str):
-        if not self.conn:
+        self.save_settings({key: value})
+
+    def save_settings(self, settings: Dict[str, str]):
+        """Save several settings in a single transaction"""
+        if not self.pool:
             self.init()
-        c = self.conn.cursor()
-        c.execute("INSERT OR REPLACE INTO llm_settings (key, value) VALUES (?, ?)", (key, value))
-        self.conn.commit()
+        with self.lock:
+            with self.pool.transaction() as conn:
+                conn.executemany("INSERT OR REPLACE INTO llm_settings (key, value) VALUES (?, ?)",
+                                 list(settings.items()))
+            if self._settings is not None:
+                self._settings.update(settings)
 
     def get_setting(self, key: str) -> Optional[str]:
-        if not self.conn:
-            self.init()
-        c = self.conn.cursor()
-        c.execute("SELECT value FROM llm_settings WHERE key = ?", (key,))
-        result = c.fetchone()
-        return result[0] if result else None
+        return self._snapshot().get(key)
 
     def get_all_settings(self) -> Dict[str, str]:
-        if not self.conn:
+        return dict(self._snapshot())
+
+    def _snapshot(self) -> Dict[str, str]:
+        if not self.pool:
             self.init()
-        c = self.conn.cursor()
-        c.execute("SELECT key, value FROM llm_settings")
-        return {row[0]: row[1] for row in c.fetchall()}
+        with self.lock:
+            now = time.monotonic()
+            if self._settings is not None and now - self._checked_at < self.refresh_interval:
+                return self._settings
+
+            # data_version changes whenever another connection commits to the database
+            data_version = self.monitor.execute("PRAGMA data_version").fetchone()[0]
+            self._checked_at = now
+            if self._settings is None or data_version != self._data_version:
+                rows = self.monitor.execute("SELECT key, value FROM llm_settings").fetchall()
+                self._settings = {row[0]: row[1] for row in rows}
+                self._data_version = data_version
+            return self._settings
 
     def close(self):
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        if self.pool:
+            self.monitor.close()
+            self.monitor = None
+            self.pool.close()
+            self.pool = None
+            self._settings = None
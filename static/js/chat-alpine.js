@@ -29,7 +29,9 @@ function chatApp() {
         showDocumentSelector: false,
         documentSearchQuery: '',
         conversations: [],
+        conversationsCursor: null, // next_cursor for the next page of conversations
         loadingConversations: false,
+        olderMessagesCursor: null, // next_before for the earlier messages of the open conversation
         
         // Search
         documentFuse: null,
@@ -127,14 +129,17 @@ function chatApp() {
         },
 
         // Conversation Management
-        async loadConversations() {
+        async loadConversations(append = false) {
             this.loadingConversations = true;
             try {
-                const response = await fetch('/api/conversations');
+                const url = append && this.conversationsCursor
+                    ? `/api/conversations?cursor=${encodeURIComponent(this.conversationsCursor)}`
+                    : '/api/conversations';
+                const response = await fetch(url);
                 const data = await response.json();
                 
                 if (!data.error) {
-                    this.conversations = data.conversations.map(conv => ({
+                    const page = data.conversations.map(conv => ({
                         ...conv,
                         // The title is already provided by the backend
                         preview: this.generateConversationPreview(conv),
@@ -143,6 +148,8 @@ function chatApp() {
                             this.allDocuments.find(doc => doc.id === docId)
                         ).filter(Boolean) // Filter out any undefined if doc not found
                     }));
+                    this.conversations = append ? [...this.conversations, ...page] : page;
+                    this.conversationsCursor = data.next_cursor || null;
                 }
             } catch (error) {
                 console.error('Error loading conversations:', error);
@@ -151,14 +158,21 @@ function chatApp() {
             }
         },
 
+        async loadMoreConversations() {
+            if (this.conversationsCursor && !this.loadingConversations) {
+                await this.loadConversations(true);
+            }
+        },
+
         async loadConversation(conversationId) {
             try {
-                const response = await fetch(`/api/conversations/${conversationId}`);
+                const response = await fetch(`/api/conversations/${conversationId}?limit=100`);
                 const data = await response.json();
                 
                 if (!data.error) {
                     this.currentConversationId = conversationId;
                     this.messages = data.messages || [];
+                    this.olderMessagesCursor = data.next_before || null;
                     this.scrollToBottom();
                 }
             } catch (error) {
@@ -167,6 +181,24 @@ function chatApp() {
             }
         },
 
+        async loadEarlierMessages() {
+            if (!this.currentConversationId || !this.olderMessagesCursor) return;
+            try {
+                const response = await fetch(
+                    `/api/conversations/${this.currentConversationId}?limit=100&before=${this.olderMessagesCursor}`
+                );
+                const data = await response.json();
+
+                if (!data.error) {
+                    this.messages = [...(data.messages || []), ...this.messages];
+                    this.olderMessagesCursor = data.next_before || null;
+                }
+            } catch (error) {
+                console.error('Error loading earlier messages:', error);
+                this.showToast('Failed to load earlier messages', 'error');
+            }
+        },
+
         async deleteConversation(conversationId) {
             this.showCustomModal(
                 'Confirm Deletion',
@@ -203,6 +235,7 @@ function chatApp() {
         newConversation() {
             this.currentConversationId = null;
             this.messages = [];
+            this.olderMessagesCursor = null;
             this.messageInput = '';
         },
 
@@ -232,7 +265,7 @@ function chatApp() {
             console.log('Sending message with webSearchEnabled:', this.webSearchEnabled);
 
             try {
-                const response = await fetch('/api/chat', {
+                const response = await fetch('/api/chat/stream', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
@@ -247,22 +280,35 @@ function chatApp() {
                     })
                 });
 
-                const data = await response.json();
-                
-                if (data.error) {
-                    throw new Error(data.error);
+                if (!response.ok) {
+                    const data = await response.json();
+                    throw new Error(data.error || 'Chat failed');
                 }
 
-                const botMessage = {
-                    role: 'bot',
-                    content: data.response,
-                    sources: data.sources || [],
-                    context_parts: data.context_parts || [],
-                    timestamp: new Date().toISOString()
-                };
-
-                this.messages.push(botMessage);
-                this.currentConversationId = data.conversation_id;
+                // Sources arrive first, then tokens as the LLM generates them
+                let streamInfo = { sources: [], context_parts: [] };
+                let botMessage = null;
+                await this.readEventStream(response, (event, data) => {
+                    if (event === 'sources') {
+                        streamInfo = data;
+                        this.currentConversationId = data.conversation_id;
+                    } else if (event === 'token') {
+                        if (!botMessage) {
+                            this.messages.push({
+                                role: 'bot',
+                                content: '',
+                                sources: streamInfo.sources || [],
+                                context_parts: streamInfo.context_parts || [],
+                                timestamp: new Date().toISOString()
+                            });
+                            botMessage = this.messages[this.messages.length - 1];
+                        }
+                        botMessage.content += data.text;
+                        this.scrollToBottom();
+                    } else if (event === 'error') {
+                        throw new Error(data.error);
+                    }
+                });
                 
                 // Update conversations list
                 await this.loadConversations();
@@ -282,6 +328,30 @@ function chatApp() {
             }
         },
 
+        async readEventStream(response, onEvent) {
+            // Minimal Server-Sent Events parser for fetch() responses (EventSource can't POST)
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    let event = 'message';
+                    let data = '';
+                    for (const line of rawEvent.split('\n')) {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    }
+                    if (data) onEvent(event, JSON.parse(data));
+                }
+            }
+        },
+
         askExample(question) {
             this.messageInput = question;
             this.sendMessage();
@@ -295,6 +365,7 @@ function chatApp() {
                 () => {
                     this.messages = [];
                     this.currentConversationId = null;
+                    this.olderMessagesCursor = null;
                     this.messageInput = '';
                     this.showToast('Chat history cleared', 'success');
                 }
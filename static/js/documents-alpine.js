@@ -404,7 +404,7 @@ function documentsApp() {
                     console.log('Upload success:', file.name, response);
                 });
 
-                this.uppy.on('complete', function(result) {
+                this.uppy.on('complete', async function(result) {
                     console.log('Upload complete:', result);
                     
                     if (result.failed.length > 0) {
@@ -412,11 +412,25 @@ function documentsApp() {
                     }
                     
                     if (result.successful.length > 0) {
-                        const totalChunks = result.successful.reduce((sum, file) => {
-                            return sum + (file.response?.body?.total_chunks || 0);
-                        }, 0);
-                        
-                        currentApp.showToast(`Successfully uploaded ${result.successful.length} files! Created ${totalChunks} chunks`, 'success');
+                        // Uploads are processed in the background; wait for their ingestion jobs
+                        const jobIds = result.successful
+                            .map(file => file.response?.body?.job_id)
+                            .filter(Boolean);
+                        currentApp.showToast(`Uploaded ${result.successful.length} files, processing...`, 'success');
+                        const jobs = await Promise.all(jobIds.map(jobId => currentApp.watchJob(jobId)));
+
+                        const processedFiles = jobs.flatMap(job => job?.files || []);
+                        const failedFiles = processedFiles.filter(file => file.stage === 'failed');
+                        const totalChunks = jobs.reduce((sum, job) => sum + (job?.total_chunks || 0), 0);
+
+                        if (failedFiles.length > 0) {
+                            currentApp.showToast(`Failed to process ${failedFiles.length} files: ${failedFiles.map(f => `${f.filename} (${f.error})`).join(', ')}`, 'error');
+                        }
+                        const deduplicatedCount = processedFiles.filter(file => file.deduplicated).length;
+                        if (processedFiles.length > failedFiles.length) {
+                            const dedupNote = deduplicatedCount > 0 ? ` (${deduplicatedCount} already indexed, reused)` : '';
+                            currentApp.showToast(`Successfully processed ${processedFiles.length - failedFiles.length} files${dedupNote}! Created ${totalChunks} chunks`, 'success');
+                        }
                         
                         // Refresh file list and stats
                         currentApp.loadFileList();
@@ -457,6 +471,25 @@ function documentsApp() {
             }
         },
 
+        watchJob(jobId) {
+            // Follow an ingestion job over SSE until every file has finished
+            return new Promise((resolve) => {
+                const source = new EventSource(`/api/jobs/${jobId}/events`);
+                let lastSnapshot = null;
+                source.onmessage = (event) => {
+                    lastSnapshot = JSON.parse(event.data);
+                    if (lastSnapshot.status === 'completed' || lastSnapshot.status === 'failed') {
+                        source.close();
+                        resolve(lastSnapshot);
+                    }
+                };
+                source.onerror = () => {
+                    source.close();
+                    resolve(lastSnapshot);
+                };
+            });
+        },
+
         triggerUpload() {
             if (this.uppy && this.uppy.getFiles().length > 0) {
                 console.log('Triggering upload for', this.uppy.getFiles().length, 'files');
@@ -0,0 +1,5 @@
+from .base import WebSearchBackend, WebSearchError, WebSearchRateLimited
+from .duckduckgo import DuckDuckGoSearch
+from .limited import CachedWebSearch
+
+__all__ = ['WebSearchBackend', 'WebSearchError', 'WebSearchRateLimited', 'DuckDuckGoSearch', 'CachedWebSearch']
@@ -0,0 +1,22 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+
+class WebSearchError(Exception):
+    """Raised by a backend when a search fails"""
+    pass
+
+
+class WebSearchRateLimited(WebSearchError):
+    """Raised by a backend when the search engine throttles or times out; worth retrying"""
+    pass
+
+
+class WebSearchBackend(ABC):
+    @abstractmethod
+    def search(self, query: str, max_results: int = 5, timeout: Optional[float] = None) -> List[Dict]:
+        """Return results as dicts with `title`, `link` and `snippet`.
+
+        `timeout` caps the seconds the search may take; None leaves it to the backend.
+        """
+        pass
@@ -0,0 +1,45 @@
+import math
+import threading
+from typing import Dict, List, Optional
+
+from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import RatelimitException, TimeoutException
+
+from .base import WebSearchBackend, WebSearchError, WebSearchRateLimited
+
+
+class DuckDuckGoSearch(WebSearchBackend):
+    """DuckDuckGo text search through shared DDGS clients.
+
+    DDGS fixes its HTTP timeout per client, so there is one client per timeout in
+    whole seconds (at most `timeout`), each reused across searches.
+    """
+
+    def __init__(self, timeout: int = 10):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.clients: Dict[int, DDGS] = {}
+
+    def _get_client(self, timeout: int) -> DDGS:
+        with self.lock:
+            if timeout not in self.clients:
+                self.clients[timeout] = DDGS(timeout=timeout)
+            return self.clients[timeout]
+
+    def search(self, query: str, max_results: int = 5, timeout: Optional[float] = None) -> List[Dict]:
+        client_timeout = self.timeout if timeout is None else max(1, min(self.timeout, math.ceil(timeout)))
+        try:
+            results = self._get_client(client_timeout).text(keywords=query, max_results=max_results)
+        except (RatelimitException, TimeoutException) as e:
+            raise WebSearchRateLimited(str(e)) from e
+        except Exception as e:
+            raise WebSearchError(str(e)) from e
+
+        return [
+            {
+                "title": result.get("title"),
+                "link": result.get("href"),
+                "snippet": result.get("body"),
+            }
+            for result in results or []
+        ]
@@ -0,0 +1,90 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .base import WebSearchBackend, WebSearchRateLimited
+
+logger = logging.getLogger(__name__)
+
+
+class CachedWebSearch(WebSearchBackend):
+    """Wraps a backend with a result cache and a global concurrency limit.
+
+    Results are cached under the normalized query. At most `max_concurrent`
+    searches hit the backend at once. When the backend reports rate limiting,
+    every caller backs off (exponentially, with jitter) before the next attempt,
+    and the search is retried up to `max_retries` times.
+
+    With a `timeout` (seconds), each search has a deadline: waiting for the
+    backoff or a free slot, the backend call and retries all have to fit before
+    it, and the search returns no results once it would run past it. The backend
+    is passed the time left, so how closely it is kept depends on the backend
+    honouring that (DuckDuckGo's client rounds it up to whole seconds).
+    """
+
+    def __init__(self, backend: WebSearchBackend, cache, normalize: Callable[[str], str],
+                 max_concurrent: int = 2, max_retries: int = 2, backoff: float = 0.5,
+                 timeout: Optional[float] = None):
+        self.backend = backend
+        self.cache = cache
+        self.normalize = normalize
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.semaphore = threading.BoundedSemaphore(max_concurrent)
+        self.lock = threading.Lock()
+        self.resume_at = 0.0
+
+    def search(self, query: str, max_results: int = 5, timeout: Optional[float] = None) -> List[Dict]:
+        key = (self.normalize(query), max_results)
+        results = self.cache.get(key)
+        if results is not None:
+            return results
+
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout or timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in range(self.max_retries + 1):
+            if not self._wait_for_backoff(deadline):
+                logger.warning(f"Web search backoff runs past the {timeout}s deadline, skipping it")
+                return []
+            if not self.semaphore.acquire(timeout=self._remaining(deadline)):
+                logger.warning(f"No web search slot free within {timeout}s, skipping it")
+                return []
+            try:
+                remaining = self._remaining(deadline)
+                if remaining == 0:
+                    logger.warning(f"Web search deadline of {timeout}s passed, skipping it")
+                    return []
+                results = self.backend.search(query, max_results=max_results, timeout=remaining)
+            except WebSearchRateLimited as e:
+                if attempt == self.max_retries:
+                    raise
+                if self._remaining(deadline) == 0:
+                    logger.warning(f"Web search rate limited and its {timeout}s deadline has passed: {e}")
+                    return []
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                logger.warning(f"Web search rate limited, backing off {delay:.2f}s: {e}")
+                with self.lock:
+                    self.resume_at = max(self.resume_at, time.monotonic() + delay)
+                continue
+            finally:
+                self.semaphore.release()
+            self.cache.put(key, results)
+            return results
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _wait_for_backoff(self, deadline: Optional[float]) -> bool:
+        """Sleep out the current backoff; False, without sleeping, if it ends after the deadline"""
+        with self.lock:
+            resume_at = self.resume_at
+        if deadline is not None and resume_at > deadline:
+            return False
+        delay = resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return True